@@ -0,0 +1,73 @@
+"""add user_tip_stats
+
+Revision ID: a3c1e5f7b9d2
+Revises: f399047c0c8d
+Create Date: 2026-10-18 09:12:04.118243
+
+"""
+
+from collections import defaultdict
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a3c1e5f7b9d2"
+down_revision: Union[str, None] = "f399047c0c8d"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    user_tip_stats = op.create_table(
+        "user_tip_stats",
+        sa.Column("user_id", sa.Integer(), nullable=False),
+        sa.Column("day", sa.Date(), nullable=False),
+        sa.Column("received_sats", sa.BigInteger(), nullable=False),
+        sa.Column("received_count", sa.Integer(), nullable=False),
+        sa.Column("sent_sats", sa.BigInteger(), nullable=False),
+        sa.Column("sent_count", sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"]),
+        sa.PrimaryKeyConstraint("user_id", "day"),
+    )
+    op.create_index(op.f("ix_user_tip_stats_day"), "user_tip_stats", ["day"], unique=False)
+
+    # Backfill the daily buckets from the tips that are already paid in
+    tip = sa.table(
+        "tip",
+        sa.column("tip_sender", sa.Integer),
+        sa.column("tweet_id", sa.BigInteger),
+        sa.column("amount_sats", sa.Integer),
+        sa.column("paid_in", sa.Boolean),
+        sa.column("created_at", sa.DateTime),
+    )
+    tweets = sa.table("tweets", sa.column("id", sa.BigInteger), sa.column("tweet_author", sa.Integer))
+
+    rows = op.get_bind().execute(
+        sa.select(tip.c.tip_sender, tweets.c.tweet_author, tip.c.amount_sats, tip.c.created_at)
+        .join(tweets, tweets.c.id == tip.c.tweet_id)
+        .where(tip.c.paid_in.is_(True), tip.c.tip_sender.is_not(None))
+    )
+
+    buckets = defaultdict(lambda: {"received_sats": 0, "received_count": 0, "sent_sats": 0, "sent_count": 0})
+    for sender_id, author_id, amount_sats, created_at in rows:
+        day = created_at.date()
+        sent = buckets[(sender_id, day)]
+        sent["sent_sats"] += amount_sats
+        sent["sent_count"] += 1
+        if author_id != sender_id:
+            received = buckets[(author_id, day)]
+            received["received_sats"] += amount_sats
+            received["received_count"] += 1
+
+    if buckets:
+        op.bulk_insert(
+            user_tip_stats,
+            [{"user_id": user_id, "day": day, **totals} for (user_id, day), totals in buckets.items()],
+        )
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_user_tip_stats_day"), table_name="user_tip_stats")
+    op.drop_table("user_tip_stats")
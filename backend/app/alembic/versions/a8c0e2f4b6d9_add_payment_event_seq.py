@@ -0,0 +1,29 @@
+"""add payment event seq
+
+Revision ID: a8c0e2f4b6d9
+Revises: f7b9d2e4a6c8
+Create Date: 2026-10-18 18:12:40.520317
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "a8c0e2f4b6d9"
+down_revision: Union[str, None] = "f7b9d2e4a6c8"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Only the Postgres SSE broker uses it
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(sa.schema.CreateSequence(sa.Sequence("payment_event_seq")))
+
+
+def downgrade() -> None:
+    if op.get_bind().dialect.name == "postgresql":
+        op.execute(sa.schema.DropSequence(sa.Sequence("payment_event_seq")))
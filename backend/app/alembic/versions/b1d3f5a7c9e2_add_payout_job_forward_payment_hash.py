@@ -0,0 +1,26 @@
+"""add payout job forward payment hash
+
+Revision ID: b1d3f5a7c9e2
+Revises: a8c0e2f4b6d9
+Create Date: 2026-10-18 19:04:12.771043
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b1d3f5a7c9e2"
+down_revision: Union[str, None] = "a8c0e2f4b6d9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("payout_jobs", sa.Column("forward_payment_hash", sa.String(), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("payout_jobs", "forward_payment_hash")
@@ -0,0 +1,31 @@
+"""add tip keyset indexes
+
+Revision ID: b7d2f4a6c8e1
+Revises: a3c1e5f7b9d2
+Create Date: 2026-10-18 10:03:51.540219
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b7d2f4a6c8e1"
+down_revision: Union[str, None] = "a3c1e5f7b9d2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_index("ix_tip_created_at_id", "tip", ["created_at", "id"], unique=False)
+    op.create_index("ix_tip_tip_sender_created_at_id", "tip", ["tip_sender", "created_at", "id"], unique=False)
+    op.create_index("ix_tip_tweet_id_created_at_id", "tip", ["tweet_id", "created_at", "id"], unique=False)
+    op.create_index(op.f("ix_tweets_tweet_author"), "tweets", ["tweet_author"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_tweets_tweet_author"), table_name="tweets")
+    op.drop_index("ix_tip_tweet_id_created_at_id", table_name="tip")
+    op.drop_index("ix_tip_tip_sender_created_at_id", table_name="tip")
+    op.drop_index("ix_tip_created_at_id", table_name="tip")
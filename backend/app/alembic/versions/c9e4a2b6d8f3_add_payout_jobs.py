@@ -0,0 +1,44 @@
+"""add payout jobs
+
+Revision ID: c9e4a2b6d8f3
+Revises: b7d2f4a6c8e1
+Create Date: 2026-10-18 12:41:07.318442
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c9e4a2b6d8f3"
+down_revision: Union[str, None] = "b7d2f4a6c8e1"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "payout_jobs",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("tip_id", sa.Integer(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("next_attempt_at", sa.DateTime(), nullable=False),
+        sa.Column("locked_at", sa.DateTime(), nullable=True),
+        sa.Column("last_error", sa.String(), nullable=True),
+        sa.Column("created_at", sa.DateTime(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.ForeignKeyConstraint(["tip_id"], ["tip.id"]),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("tip_id"),
+    )
+    op.create_index(op.f("ix_payout_jobs_id"), "payout_jobs", ["id"], unique=True)
+    op.create_index("ix_payout_jobs_status_next_attempt_at", "payout_jobs", ["status", "next_attempt_at"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_payout_jobs_status_next_attempt_at", table_name="payout_jobs")
+    op.drop_index(op.f("ix_payout_jobs_id"), table_name="payout_jobs")
+    op.drop_table("payout_jobs")
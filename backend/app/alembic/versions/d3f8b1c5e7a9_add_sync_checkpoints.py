@@ -0,0 +1,32 @@
+"""add sync checkpoints
+
+Revision ID: d3f8b1c5e7a9
+Revises: c9e4a2b6d8f3
+Create Date: 2026-10-18 14:12:45.902117
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d3f8b1c5e7a9"
+down_revision: Union[str, None] = "c9e4a2b6d8f3"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "sync_checkpoints",
+        sa.Column("name", sa.String(), nullable=False),
+        sa.Column("synced_until", sa.BigInteger(), nullable=False),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("name"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("sync_checkpoints")
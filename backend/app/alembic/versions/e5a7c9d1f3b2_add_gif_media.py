@@ -0,0 +1,38 @@
+"""add gif media
+
+Revision ID: e5a7c9d1f3b2
+Revises: d3f8b1c5e7a9
+Create Date: 2026-10-18 16:41:07.318264
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5a7c9d1f3b2"
+down_revision: Union[str, None] = "d3f8b1c5e7a9"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "gif_media",
+        sa.Column("gif_url", sa.String(), nullable=False),
+        sa.Column("content_sha256", sa.String(), nullable=False),
+        sa.Column("content_type", sa.String(), nullable=False),
+        sa.Column("size_bytes", sa.BigInteger(), nullable=False),
+        sa.Column("media_id", sa.String(), nullable=True),
+        sa.Column("media_expires_at", sa.DateTime(), nullable=True),
+        sa.Column("updated_at", sa.DateTime(), nullable=False),
+        sa.PrimaryKeyConstraint("gif_url"),
+    )
+    op.create_index(op.f("ix_gif_media_content_sha256"), "gif_media", ["content_sha256"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index(op.f("ix_gif_media_content_sha256"), table_name="gif_media")
+    op.drop_table("gif_media")
@@ -0,0 +1,28 @@
+"""add payout job media id
+
+Revision ID: f7b9d2e4a6c8
+Revises: e5a7c9d1f3b2
+Create Date: 2026-10-18 17:26:53.640918
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "f7b9d2e4a6c8"
+down_revision: Union[str, None] = "e5a7c9d1f3b2"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("payout_jobs", sa.Column("media_id", sa.String(), nullable=True))
+    op.add_column("payout_jobs", sa.Column("media_polls", sa.Integer(), server_default="0", nullable=False))
+
+
+def downgrade() -> None:
+    op.drop_column("payout_jobs", "media_polls")
+    op.drop_column("payout_jobs", "media_id")
@@ -1,4 +1,4 @@
-from typing import Optional
+from typing import List, Optional
 
 from dotenv import load_dotenv
 from pydantic import BaseSettings
@@ -41,14 +41,82 @@ class Settings(BaseSettings):
     DB_PASS: Optional[str] = None
     DB_NAME: Optional[str] = None
 
+    # Connection pool (applies to the sync and async Postgres engines)
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_PRE_PING: bool = True
+    DB_POOL_RECYCLE_SECONDS: int = 1800
+    DB_POOL_TIMEOUT_SECONDS: int = 30
+
     GREENLIGHT_CLIENT_CERTIFICATE: str
     GREENLIGHT_CLIENT_PRIVATE_KEY: str
 
     # Application settings
     LEADERBOARD_CALCULATION_WINDOW_DAYS: int = 365  # a value in .env would override this
+    LEADERBOARD_CACHE_TTL_SECONDS: int = 60
+    TIPS_PAGE_SIZE_DEFAULT: int = 50
+    TIPS_PAGE_SIZE_MAX: int = 100
     TWITTER_AVATAR_CACHE_TTL_DAYS: int = 30
+    TWITTER_AVATAR_REFRESH_IN_BACKGROUND: bool = True  # serve cached avatars, refresh stale ones off the request path
+    TWITTER_AVATAR_REFRESH_MIN_INTERVAL_SECONDS: float = 3.0  # users lookup: 300 requests / 15 min
+    TWITTER_AVATAR_REFRESH_RETRY_SECONDS: int = 3600
+    TWITTER_BOT_ACCOUNT_RETRY_SECONDS: int = 300  # after a failed users/me lookup of the posting account
     BREEZ_LOGLEVEL: str = "INFO"
+    BREEZ_CONNECT_RETRY_BASE_SECONDS: float = 1.0
+    BREEZ_CONNECT_RETRY_MAX_SECONDS: float = 60.0
     FRONTEND_URL: str
+    # Breez connection, Twitter lookups and the payout/avatar/invoice workers; the test suite turns them off
+    RUN_BACKGROUND_SERVICES: bool = True
+
+    INVOICE_CREATE_CONCURRENCY: int = 8
+    INVOICE_CREATE_TIMEOUT_SECONDS: float = 15.0
+    INVOICE_POOL_AMOUNTS: List[int] = []  # e.g. [21, 100, 1000]; empty disables the pool
+    INVOICE_POOL_SIZE: int = 5  # ready invoices per amount
+    INVOICE_POOL_INVOICE_EXPIRY_SECONDS: int = 3600
+    INVOICE_POOL_EXPIRY_MARGIN_SECONDS: int = 900  # retire pooled invoices this long before they expire
+    INVOICE_POOL_REFILL_INTERVAL_SECONDS: float = 30.0
+    LNURL_PAY_CACHE_TTL_SECONDS: int = 600
+    LNURL_PAY_NEGATIVE_CACHE_TTL_SECONDS: int = 60
+
+    # Shared outbound HTTP clients (Twitter, LNURL, BIP353)
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 5.0
+    HTTP_READ_TIMEOUT_SECONDS: float = 30.0
+    HTTP_RETRIES: int = 3
+    HTTP_POOL_HOSTS: int = 10  # hosts with their own keep-alive pool
+    HTTP_POOL_MAXSIZE: int = 20  # keep-alive connections per host
+
+    SSE_BROKER: str = "memory"  # "postgres" fans payment events out to every worker via LISTEN/NOTIFY
+    SSE_BROKER_CHANNEL: str = "payment_events"
+    SSE_HEARTBEAT_SECONDS: float = 15.0
+    SSE_CONNECTION_TTL_SECONDS: int = 1800
+    SSE_QUEUE_MAXSIZE: int = 16  # per connection; the oldest update is dropped when full
+    SSE_REPLAY_EVENTS_PER_PAYMENT: int = 8
+    SSE_REPLAY_MAX_PAYMENTS: int = 10000
+
+    PAID_INVOICE_BATCH_WINDOW_SECONDS: float = 0.05
+    PAID_INVOICE_BATCH_MAX: int = 500
+    PAID_INVOICE_RETRY_BASE_SECONDS: float = 1.0  # doubles per consecutive failed batch
+    PAID_INVOICE_MAX_RETRIES: int = 5  # then reconciliation recovers them
+    PAYMENT_RECONCILE_INTERVAL_SECONDS: int = 600
+    PAYMENT_RECONCILE_PAGE_SIZE: int = 200
+    PAYMENT_RECONCILE_OVERLAP_SECONDS: int = 3600
+    PAYMENT_RECONCILE_INITIAL_LOOKBACK_SECONDS: int = 7 * 24 * 3600  # first run, before any checkpoint exists
+
+    GIF_MAX_BYTES: int = 15 * 1024 * 1024  # Twitter's limit for animated GIFs
+    GIF_UPLOAD_CHUNK_BYTES: int = 4 * 1024 * 1024  # APPEND segment size, also the download buffer
+    GIF_CACHE_DIR: str = "/tmp/zapzap-gif-cache"  # content-addressed copies of tipped GIFs
+    GIF_CACHE_MAX_BYTES: int = 512 * 1024 * 1024  # least recently used GIFs are evicted past this
+    GIF_MEDIA_DEFAULT_EXPIRY_SECONDS: int = 24 * 3600  # when FINALIZE doesn't report expires_after_secs
+    GIF_MEDIA_REUSE_MARGIN_SECONDS: int = 3600  # don't reuse a media_id this close to its expiry
+    GIF_MEDIA_MAX_PROCESSING_POLLS: int = 20  # STATUS checks before a tip's GIF is given up on
+
+    # Payout job queue (GIF post + forwarding of paid tips)
+    PAYOUT_WORKERS: int = 4
+    PAYOUT_POLL_INTERVAL_SECONDS: float = 5.0
+    PAYOUT_MAX_ATTEMPTS: int = 8
+    PAYOUT_RETRY_BASE_SECONDS: int = 30
+    PAYOUT_RETRY_MAX_SECONDS: int = 3600
+    PAYOUT_JOB_LOCK_TIMEOUT_SECONDS: int = 600
 
     class Config:
         env_file = "backend/app/.env"
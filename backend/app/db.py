@@ -2,8 +2,16 @@ import os
 
 import sqlalchemy
 from config import settings
-from google.cloud.sql.connector import Connector
+from google.cloud.sql.connector import Connector, create_async_connector
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import (
+    AsyncEngine,
+    AsyncSession,
+    async_sessionmaker,
+    create_async_engine,
+)
 from sqlalchemy.orm import (
+    Session,
     declarative_base,
     sessionmaker,
 )
@@ -11,6 +19,16 @@ from sqlalchemy.orm import (
 Base = declarative_base()
 
 
+def get_pool_options() -> dict:
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+        "pool_recycle": settings.DB_POOL_RECYCLE_SECONDS,
+        "pool_timeout": settings.DB_POOL_TIMEOUT_SECONDS,
+    }
+
+
 def get_engine() -> sqlalchemy.engine.base.Engine:
     # If we're in development, use local SQLite
     if settings.ENVIRONMENT == "development":
@@ -21,7 +39,8 @@ def get_engine() -> sqlalchemy.engine.base.Engine:
         if db_host == "cloudsql-proxy":  # if we are running inside Docker Compose
             print("DB_HOST is set; connecting via host/port instead of Cloud SQL connector.")
             engine = sqlalchemy.create_engine(
-                f"postgresql+pg8000://{settings.DB_USER}:{settings.DB_PASS}@{db_host}:5432/{settings.DB_NAME}"
+                f"postgresql+pg8000://{settings.DB_USER}:{settings.DB_PASS}@{db_host}:5432/{settings.DB_NAME}",
+                **get_pool_options(),
             )
         else:
             print("No DB_HOST set; using Cloud SQL connector as usual.")
@@ -39,13 +58,48 @@ def get_engine() -> sqlalchemy.engine.base.Engine:
             engine = sqlalchemy.create_engine(
                 "postgresql+pg8000://",
                 creator=getconn,
+                **get_pool_options(),
             )
     return engine
 
 
+def get_async_engine() -> AsyncEngine:
+    # Same database as get_engine(), reached through asyncio drivers (aiosqlite / asyncpg)
+    if settings.ENVIRONMENT == "development":
+        url = sqlalchemy.engine.make_url(settings.LOCAL_DATABASE_URL).set(drivername="sqlite+aiosqlite")
+        return create_async_engine(url)
+
+    db_host = os.environ.get("DB_HOST")
+    if db_host == "cloudsql-proxy":
+        return create_async_engine(
+            f"postgresql+asyncpg://{settings.DB_USER}:{settings.DB_PASS}@{db_host}:5432/{settings.DB_NAME}",
+            **get_pool_options(),
+        )
+
+    connector = None
+
+    async def getconn():
+        # The async connector must be created inside the running event loop
+        nonlocal connector
+        if connector is None:
+            connector = await create_async_connector()
+        return await connector.connect_async(
+            settings.DB_INSTANCE_CONNECTION_NAME,
+            "asyncpg",
+            user=settings.DB_USER,
+            password=settings.DB_PASS,
+            db=settings.DB_NAME,
+        )
+
+    return create_async_engine("postgresql+asyncpg://", async_creator=getconn, **get_pool_options())
+
+
 engine = get_engine()
 SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
+async_engine = get_async_engine()
+AsyncSessionLocal = async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
 
 def get_db():
     db = SessionLocal()
@@ -53,3 +107,15 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+def dialect_insert(db: Session | AsyncSession):
+    """Return the dialect's ``insert`` construct so callers can use ``on_conflict_do_update``."""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
@@ -4,11 +4,17 @@ import logging
 from config import settings
 from db import Base, engine
 from fastapi import FastAPI
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
 from routes import auths, sse, tips, users
-from routes.sse import cleanup_stale_connections
-from services.lightning_service import connect_breez, init_breez_logging
-from services.twitter_service import verify_twitter_credentials
+from routes.sse import expire_connections
+from services.gif_cache import gif_cache_stats
+from services.lightning_service import breez_health, connect_breez_with_retry, init_breez_logging, invoice_pool
+from services.payment_ingest import paid_invoice_batcher, run_payment_reconciliation
+from services.payout_service import payout_workers
+from services.twitter_service import avatar_refresher, get_bot_account, verify_twitter_credentials
+from utils.http_client import close_async_http_client
 
 # Create all DB tables
 Base.metadata.create_all(bind=engine)
@@ -17,92 +23,80 @@ Base.metadata.create_all(bind=engine)
 app = FastAPI(title="ZapZap Backend")
 
 cleanup_task = None
-breez_retry_task = None
-breez_connected = False
+reconcile_task = None
+breez_connect_task = None
 
 
-async def try_reconnect_breez():
-    global breez_connected
-
-    logging.info("Breez reconnection task started")
-
-    while not breez_connected:
-        logging.info("Attempting to reconnect to Breez...")
-        try:
-            success = connect_breez(restore_only=True)
-            logging.info(f"Connection attempt result: {success}")
+@app.on_event("startup")
+async def startup_event():
+    global cleanup_task, breez_connect_task, reconcile_task
 
-            if success:
-                from services.lightning_service import sdk_services
+    if settings.RUN_BACKGROUND_SERVICES:
+        await start_background_services()
+    else:
+        logging.warning("RUN_BACKGROUND_SERVICES is off: not connecting to Breez or Twitter, no payout workers")
 
-                logging.info(f"SDK services after connect attempt: {sdk_services is not None}")
+    sse.loop_bridge.bind(asyncio.get_running_loop())
+    await sse.broker.start()
 
-                if sdk_services is not None:
-                    breez_connected = True
-                    logging.info("Breez Connected Successfully!")
-                else:
-                    breez_connected = False
-                    logging.error("Breez SDK service is None despite connection.")
-        except Exception as e:
-            logging.error(f"Error during Breez reconnection attempt: {e}")
-            breez_connected = False
-        if not breez_connected:
-            logging.info("Retrying Breez connection in 5 seconds...")
-            await asyncio.sleep(5)
-    logging.info("Exiting Breez reconnect loop.")
+    # Start SSE cleanup task
+    cleanup_task = asyncio.create_task(expire_connections())
+    logging.info("SSE expiry task started")
 
 
-@app.on_event("startup")
-async def startup_event():
-    global cleanup_task, breez_retry_task, breez_connected
+async def start_background_services():
+    global breez_connect_task, reconcile_task
 
     init_breez_logging()
+    # Before connecting: the SDK may replay INVOICE_PAID events as soon as it is up
+    paid_invoice_batcher.start()
 
-    try:
-        success = connect_breez(restore_only=True)
-        if success:
-            from services.lightning_service import sdk_services
-
-            if sdk_services is not None:
-                breez_connected = True
-                logging.info("Breez connected on startup.")
-        else:
-            logging.error("Failed to connect Breez on startup, will start retry loop.")
-    except Exception as e:
-        logging.error(f"Error during Breez connection: {e}")
-
-    if not breez_connected:
-        breez_retry_task = asyncio.create_task(try_reconnect_breez())
+    # Connect in the background so the app serves requests (leaderboards, SSE) while Lightning comes up
+    breez_connect_task = asyncio.create_task(connect_breez_with_retry(restore_only=True))
+    # Waits for the Breez connection, then picks up invoices paid while we were down
+    reconcile_task = asyncio.create_task(run_payment_reconciliation())
     try:
         await verify_twitter_credentials()
         logging.info("Twitter credentials verified successfully")
+        # Cached for building GIF tweet URLs; only looked up again if the credentials change
+        await run_in_threadpool(get_bot_account)
     except Exception as e:
         logging.error(f"Twitter credentials verification failed: {str(e)}")
         logging.warning("Avatar updates may not work, but app will continue running")
 
-    # Start SSE cleanup task
-    cleanup_task = asyncio.create_task(cleanup_stale_connections())
-    logging.info("SSE cleanup task started")
+    avatar_refresher.start()
+    payout_workers.start()
+    invoice_pool.start()
 
 
 # Add shutdown event
 @app.on_event("shutdown")
 async def shutdown_event():
-    global cleanup_task, breez_retry_task
-    # Cancel SSE cleanup task
-    if cleanup_task:
-        cleanup_task.cancel()
-        try:
-            await cleanup_task
-        except asyncio.CancelledError:
-            pass
-
-    if breez_retry_task:
-        breez_retry_task.cancel()
-        try:
-            await breez_retry_task
-        except asyncio.CancelledError:
-            pass
+    global cleanup_task, breez_connect_task, reconcile_task
+    if settings.RUN_BACKGROUND_SERVICES:
+        avatar_refresher.stop()
+        paid_invoice_batcher.stop()
+        payout_workers.stop()
+        invoice_pool.stop()
+    await sse.broker.stop()
+    sse.loop_bridge.unbind()
+    await close_async_http_client()
+
+    # SSE cleanup, reconciliation and Breez connect tasks
+    for task in (cleanup_task, reconcile_task, breez_connect_task):
+        if task:
+            await cancel_task(task)
+
+
+async def cancel_task(task: asyncio.Task):
+    task.cancel()
+    try:
+        await task
+    except asyncio.CancelledError:
+        pass
+    except Exception as e:
+        # Already failed before shutdown; re-raising would fail app teardown
+        logging.error(f"Background task {task.get_name()} failed: {e}")
 
 
 # Define allowed CORS origins
@@ -135,4 +129,23 @@ def root():
 
 @app.get("/config-check")
 def config_check():
-    return {"env": settings.ENVIRONMENT, "greet": settings.GREETING, "breez_connected": bool(sdk_services)}
+    return {"env": settings.ENVIRONMENT, "greet": settings.GREETING, "breez_connected": breez_health.connected}
+
+
+@app.get("/gif-cache/metrics")
+def gif_cache_metrics():
+    return gif_cache_stats()
+
+
+@app.get("/health/live")
+def liveness():
+    return {"status": "ok"}
+
+
+@app.get("/health/ready")
+def readiness():
+    # Not ready until the Lightning node is connected: tips can't be created or paid out before that
+    status_code = 200 if breez_health.connected else 503
+    return JSONResponse(
+        status_code=status_code, content={"ready": breez_health.connected, "breez": breez_health.as_dict()}
+    )
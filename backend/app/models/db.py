@@ -1,10 +1,12 @@
-from datetime import datetime, timezone
+from datetime import date, datetime, timezone
 from typing import List, Optional
 
 from db import Base
 from sqlalchemy import (
     BigInteger,
     ForeignKey,
+    Index,
+    Sequence,
 )
 from sqlalchemy.orm import (
     Mapped,
@@ -13,12 +15,17 @@ from sqlalchemy.orm import (
 )
 
 
+def utcnow() -> datetime:
+    """Naive UTC for the TIMESTAMP WITHOUT TIME ZONE columns: asyncpg rejects timezone-aware values for them."""
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
 class User(Base):
     __tablename__ = "users"
     __table_args__ = {"extend_existing": True}
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True, unique=True)
-    created_at: Mapped[datetime] = mapped_column(default=datetime.now(timezone.utc), index=True)
+    created_at: Mapped[datetime] = mapped_column(default=utcnow, index=True)
     twitter_username: Mapped[str] = mapped_column(index=True, unique=True)
     avatar_url: Mapped[Optional[str]] = mapped_column(nullable=True)
     twitter_access_token: Mapped[Optional[str]] = mapped_column(nullable=True)
@@ -43,7 +50,12 @@ class User(Base):
 
 class Tip(Base):
     __tablename__ = "tip"
-    __table_args__ = {}
+    __table_args__ = (
+        # Keyset pagination indexes, newest first by (created_at, id)
+        Index("ix_tip_created_at_id", "created_at", "id"),
+        Index("ix_tip_tip_sender_created_at_id", "tip_sender", "created_at", "id"),
+        Index("ix_tip_tweet_id_created_at_id", "tweet_id", "created_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(primary_key=True, index=True, unique=True)
 
@@ -59,7 +71,7 @@ class Tip(Base):
     paid_in: Mapped[bool] = mapped_column(default=False)
     paid_out: Mapped[bool] = mapped_column(default=False)
     forward_payment_hash: Mapped[Optional[str]] = mapped_column(nullable=True, index=True)
-    created_at: Mapped[datetime] = mapped_column(default=datetime.now(timezone.utc), index=True)
+    created_at: Mapped[datetime] = mapped_column(default=utcnow, index=True)
     gif_url: Mapped[Optional[str]] = mapped_column(nullable=True)
 
     # Relationships
@@ -80,7 +92,7 @@ class Tweet(Base):
     __table_args__ = {"extend_existing": True}
 
     id: Mapped[int] = mapped_column(BigInteger, nullable=False, primary_key=True, index=True, unique=True)
-    tweet_author: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False)
+    tweet_author: Mapped[int] = mapped_column(ForeignKey("users.id"), nullable=False, index=True)
 
     # Relationships
     tips: Mapped[List["Tip"]] = relationship(
@@ -93,3 +105,68 @@ class Tweet(Base):
         back_populates="authored_tweets",
         foreign_keys=[tweet_author],
     )
+
+
+class UserTipStats(Base):
+    """Per-user daily tip totals, incremented when a tip is marked paid_in."""
+
+    __tablename__ = "user_tip_stats"
+    __table_args__ = {"extend_existing": True}
+
+    user_id: Mapped[int] = mapped_column(ForeignKey("users.id"), primary_key=True)
+    day: Mapped[date] = mapped_column(primary_key=True, index=True)
+    received_sats: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    received_count: Mapped[int] = mapped_column(default=0, nullable=False)
+    sent_sats: Mapped[int] = mapped_column(BigInteger, default=0, nullable=False)
+    sent_count: Mapped[int] = mapped_column(default=0, nullable=False)
+
+
+class PayoutJob(Base):
+    """Durable work item: post the GIF for a paid tip and forward the sats to the recipient."""
+
+    __tablename__ = "payout_jobs"
+    __table_args__ = (Index("ix_payout_jobs_status_next_attempt_at", "status", "next_attempt_at"),)
+
+    id: Mapped[int] = mapped_column(primary_key=True, index=True, unique=True)
+    tip_id: Mapped[int] = mapped_column(ForeignKey("tip.id"), nullable=False, unique=True)
+    status: Mapped[str] = mapped_column(default="pending", nullable=False)  # pending, running, done, failed
+    attempts: Mapped[int] = mapped_column(default=0, nullable=False)
+    next_attempt_at: Mapped[datetime] = mapped_column(default=utcnow, nullable=False)
+    locked_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    last_error: Mapped[Optional[str]] = mapped_column(nullable=True)
+    media_id: Mapped[Optional[str]] = mapped_column(nullable=True)  # uploaded GIF Twitter is still processing
+    media_polls: Mapped[int] = mapped_column(default=0, server_default="0", nullable=False)  # STATUS checks so far
+    # Invoice being paid to the recipient, recorded before paying; the node is asked about it before paying again
+    forward_payment_hash: Mapped[Optional[str]] = mapped_column(nullable=True)
+    created_at: Mapped[datetime] = mapped_column(default=utcnow, nullable=False)
+    updated_at: Mapped[datetime] = mapped_column(default=utcnow, onupdate=utcnow, nullable=False)
+
+    tip: Mapped["Tip"] = relationship("Tip", foreign_keys=[tip_id])
+
+
+class SyncCheckpoint(Base):
+    """How far a background sync (e.g. payment reconciliation against the node) has progressed."""
+
+    __tablename__ = "sync_checkpoints"
+
+    name: Mapped[str] = mapped_column(primary_key=True)
+    synced_until: Mapped[int] = mapped_column(BigInteger, nullable=False)  # unix timestamp, seconds
+    updated_at: Mapped[datetime] = mapped_column(default=utcnow, onupdate=utcnow, nullable=False)
+
+
+class GifMedia(Base):
+    """Content hash of a tipped GIF URL and the last Twitter media_id it was uploaded as."""
+
+    __tablename__ = "gif_media"
+
+    gif_url: Mapped[str] = mapped_column(primary_key=True)
+    content_sha256: Mapped[str] = mapped_column(nullable=False, index=True)
+    content_type: Mapped[str] = mapped_column(nullable=False)
+    size_bytes: Mapped[int] = mapped_column(BigInteger, nullable=False)
+    media_id: Mapped[Optional[str]] = mapped_column(nullable=True)
+    media_expires_at: Mapped[Optional[datetime]] = mapped_column(nullable=True)
+    updated_at: Mapped[datetime] = mapped_column(default=utcnow, onupdate=utcnow, nullable=False)
+
+
+# SSE event ids of the Postgres broker: one ordering shared by every replica, unlike their clocks
+payment_event_seq = Sequence("payment_event_seq", metadata=Base.metadata)
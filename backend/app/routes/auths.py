@@ -2,12 +2,13 @@ import logging
 from datetime import timedelta
 
 from config import settings
-from db import get_db
+from db import get_async_db
 from fastapi import APIRouter, Depends, HTTPException, Request
 from fastapi.responses import RedirectResponse
 from models.db import User
 from schemas.auth import Token
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from utils.security import create_access_token
 from utils.twitter_oauth import (
     exchange_code_for_token,
@@ -26,7 +27,7 @@ def twitter_login():
 
 
 @router.get("/twitter/callback", response_model=Token)
-async def twitter_callback(request: Request, db: Session = Depends(get_db)):
+async def twitter_callback(request: Request, db: AsyncSession = Depends(get_async_db)):
     code = request.query_params.get("code")
     # state = request.query_params.get("state")
     if not code:
@@ -51,7 +52,8 @@ async def twitter_callback(request: Request, db: Session = Depends(get_db)):
     twitter_username = user_info["data"]["username"]
     twitter_username = twitter_username.lower()
 
-    user = db.query(User).filter(User.twitter_username == twitter_username).first()
+    result = await db.execute(select(User).where(User.twitter_username == twitter_username))
+    user = result.scalars().first()
 
     if not user:
         user = User(twitter_username=twitter_username, is_registered=True)
@@ -59,8 +61,8 @@ async def twitter_callback(request: Request, db: Session = Depends(get_db)):
     else:
         user.is_registered = True
 
-    db.commit()
-    db.refresh(user)
+    await db.commit()
+    await db.refresh(user)
 
     access_token_expires = timedelta(seconds=settings.JWT_ACCESS_TOKEN_EXPIRE_SECONDS)
     token = create_access_token(data={"sub": str(user.twitter_username)}, expires_delta=access_token_expires)
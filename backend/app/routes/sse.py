@@ -1,12 +1,19 @@
 # routes/sse.py
+import heapq
 import json
 import logging
-from asyncio import Queue, sleep
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import threading
+import time
+from asyncio import FIRST_COMPLETED, AbstractEventLoop, Event, Queue, ensure_future, sleep, wait, wait_for
+from collections import OrderedDict, deque
+from datetime import datetime
+from itertools import count
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple
 
+from config import settings
 from fastapi import APIRouter, HTTPException, Request
 from fastapi.responses import StreamingResponse
+from services.sse_broker import create_broker
 
 cleanup_task = None
 
@@ -14,13 +21,96 @@ router = APIRouter(prefix="/sse", tags=["sse"])
 
 
 class Connection:
+    __slots__ = ("queue", "connected_at")
+
     def __init__(self, queue: Queue):
-        self.queue: Queue = queue
+        self.queue: Optional[Queue] = queue  # None once the stream has ended
         self.connected_at: datetime = datetime.now()
 
+    def put(self, event: Tuple[int, str]):
+        if self.queue is None:
+            return
+        # Bounded queue: a client that stopped reading loses its oldest updates, not the newest
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+
+# Payment hash -> active connections
+connections: Dict[str, Set[Connection]] = {}
+
+# (expires_at, seq, payment_hash, connection) min-heap. Entries of connections that already closed are
+# skipped when popped, so expiry only touches connections whose deadline has passed. Closed connections
+# drop their queue, and the heap is rebuilt once their entries outnumber the live ones.
+expiry_heap: List[Tuple[float, int, str, Connection]] = []
+_expiry_seq = count()
+_stale_expiry_entries = 0
+EXPIRY_HEAP_COMPACT_MIN = 1024
+_expiry_wakeup: Optional[Event] = None  # created by expire_connections() on the running loop
+
+# Put on a connection's queue to end its stream
+CLOSE_STREAM = None
+
+# Payment hash -> last few (event_id, update) pairs, replayed to clients that subscribe late or reconnect.
+# Least recently updated payment hashes are evicted first.
+recent_events: "OrderedDict[str, Deque[Tuple[int, str]]]" = OrderedDict()
+
+
+def remember_event(payment_hash: str, event_id: int, update: str):
+    events = recent_events.get(payment_hash)
+    if events is None:
+        events = recent_events[payment_hash] = deque(maxlen=settings.SSE_REPLAY_EVENTS_PER_PAYMENT)
+        while len(recent_events) > settings.SSE_REPLAY_MAX_PAYMENTS:
+            recent_events.popitem(last=False)
+    else:
+        recent_events.move_to_end(payment_hash)
+    events.append((event_id, update))
+
+
+def events_after(payment_hash: str, last_event_id: int) -> List[Tuple[int, str]]:
+    return [event for event in recent_events.get(payment_hash, ()) if event[0] > last_event_id]
+
+
+def parse_last_event_id(value: Optional[str]) -> int:
+    try:
+        return int(value) if value else 0
+    except ValueError:
+        return 0
 
-# Payment hash -> list of active connections
-connections: Dict[str, List[Connection]] = {}
+
+async def wait_for_disconnect(request: Request):
+    """Returns once the client has gone away; the body of a GET is already read, so only http.disconnect is left."""
+    while (await request.receive())["type"] != "http.disconnect":
+        pass
+
+
+def remove_connection(payment_hash: str, connection: Connection) -> bool:
+    """Unregister the connection. Returns False if it was already gone (e.g. expired)."""
+    subscribers = connections.get(payment_hash)
+    if connection not in (subscribers or ()):
+        return False
+    subscribers.discard(connection)
+    if not subscribers:
+        del connections[payment_hash]
+    return True
+
+
+def is_registered(payment_hash: str, connection: Connection) -> bool:
+    return connection in connections.get(payment_hash, ())
+
+
+def close_connection(payment_hash: str, connection: Connection):
+    """Release a stream that ended before its deadline; its expiry entry stays behind until popped or compacted"""
+    global _stale_expiry_entries
+    connection.queue = None
+    if not remove_connection(payment_hash, connection):
+        return  # expired: its heap entry is already gone
+
+    _stale_expiry_entries += 1
+    if _stale_expiry_entries > max(len(expiry_heap) // 2, EXPIRY_HEAP_COMPACT_MIN):
+        expiry_heap[:] = [entry for entry in expiry_heap if is_registered(entry[2], entry[3])]
+        heapq.heapify(expiry_heap)
+        _stale_expiry_entries = 0
 
 
 @router.get("/subscribe")
@@ -28,16 +118,24 @@ async def subscribe_to_payment(request: Request, payment_hash: str):
     if not payment_hash:
         raise HTTPException(status_code=400, detail="Payment hash is required")
 
-    q = Queue()
+    q = Queue(maxsize=settings.SSE_QUEUE_MAXSIZE)
     connection = Connection(q)
+    connections.setdefault(payment_hash, set()).add(connection)
+    expires_at = time.monotonic() + settings.SSE_CONNECTION_TTL_SECONDS
+    heapq.heappush(expiry_heap, (expires_at, next(_expiry_seq), payment_hash, connection))
+    if _expiry_wakeup is not None:
+        _expiry_wakeup.set()
 
-    if payment_hash not in connections:
-        connections[payment_hash] = []
-    connections[payment_hash].append(connection)
+    # Snapshot in the same loop step as the registration: later events arrive through the queue
+    last_event_id = parse_last_event_id(request.headers.get("last-event-id"))
+    missed_events = events_after(payment_hash, last_event_id)
 
     logging.info(f"New client connected to payment_hash={payment_hash}")
 
     async def event_stream():
+        # Every wait races the client's disconnect, so a dead client releases its queue right away rather than
+        # at the next heartbeat, whether or not the server cancels this generator on disconnect
+        disconnected = ensure_future(wait_for_disconnect(request))
         try:
             # Send initial connection confirmation
             message = json.dumps(
@@ -45,27 +143,44 @@ async def subscribe_to_payment(request: Request, payment_hash: str):
             )
             yield f"data: {message}\n\n"
 
+            # Replay what the client missed (e.g. the invoice was paid before it subscribed)
+            sent_event_id = last_event_id
+            for event_id, msg in missed_events:
+                yield f"id: {event_id}\ndata: {msg}\n\n"
+                sent_event_id = event_id
+
             while True:
-                if await request.is_disconnected():
-                    logging.info(f"Client disconnected from payment_hash={payment_hash}")
-                    break
+                next_event = ensure_future(q.get())
+                await wait(
+                    {next_event, disconnected}, timeout=settings.SSE_HEARTBEAT_SECONDS, return_when=FIRST_COMPLETED
+                )
+                if not next_event.done():
+                    next_event.cancel()
+                    if disconnected.done():
+                        logging.info(f"Client disconnected from payment_hash={payment_hash}")
+                        break
+                    # Comment line: keeps proxies from closing an idle stream, ignored by EventSource
+                    yield ": keepalive\n\n"
+                    continue
 
-                try:
-                    msg = await q.get()
-                    yield f"data: {msg}\n\n"
-                except Exception as e:
-                    logging.error(f"Error sending SSE message: {e}")
+                event = next_event.result()
+                if event is CLOSE_STREAM:
+                    logging.info(f"Connection for payment_hash={payment_hash} expired")
                     break
 
+                event_id, msg = event
+                if event_id <= sent_event_id:
+                    continue
+                yield f"id: {event_id}\ndata: {msg}\n\n"
+                sent_event_id = event_id
+
         except Exception as e:
             logging.error(f"Error in event stream: {e}")
         finally:
             # Clean up when client disconnects
-            if payment_hash in connections:
-                connections[payment_hash] = [conn for conn in connections[payment_hash] if conn.queue != q]
-                if not connections[payment_hash]:
-                    del connections[payment_hash]
-                logging.info(f"Cleaned up connection for payment_hash={payment_hash}")
+            disconnected.cancel()
+            close_connection(payment_hash, connection)
+            logging.info(f"Cleaned up connection for payment_hash={payment_hash}")
 
     return StreamingResponse(
         event_stream(),
@@ -79,6 +194,75 @@ async def subscribe_to_payment(request: Request, payment_hash: str):
     )
 
 
+def deliver_to_local_clients(payment_hash: str, event_id: int, update: str):
+    """Record the update for replay and push it to the clients of this process that subscribed to the payment hash"""
+    remember_event(payment_hash, event_id, update)
+    for conn in connections.get(payment_hash, ()):
+        conn.put((event_id, update))
+
+
+class LoopBridge:
+    """
+    Hands updates from other threads (Breez listener, payout workers) to the event loop that owns the queues.
+    Updates are buffered and drained in one loop callback, so a burst of payments costs a single wakeup.
+    """
+
+    def __init__(self, deliver: Callable[[str, int, str], None]):
+        self.deliver = deliver
+        self.loop: Optional[AbstractEventLoop] = None
+        self._loop_thread_id: Optional[int] = None
+        self._pending: Deque[Tuple[str, int, str]] = deque()
+        self._lock = threading.Lock()
+        self._drain_scheduled = False
+
+    def bind(self, loop: AbstractEventLoop):
+        """Call from the event loop thread at startup"""
+        self.loop = loop
+        self._loop_thread_id = threading.get_ident()
+
+    def unbind(self):
+        self.loop = None
+        self._loop_thread_id = None
+
+    def submit(self, payment_hash: str, event_id: int, update: str):
+        loop = self.loop
+        if loop is None or threading.get_ident() == self._loop_thread_id:
+            self.deliver(payment_hash, event_id, update)
+            return
+
+        with self._lock:
+            self._pending.append((payment_hash, event_id, update))
+            if self._drain_scheduled:
+                return
+            self._drain_scheduled = True
+
+        try:
+            loop.call_soon_threadsafe(self._drain)
+        except RuntimeError as e:  # loop closed during shutdown
+            logging.error(f"Dropping SSE updates, event loop unavailable: {e}")
+            with self._lock:
+                self._pending.clear()
+                self._drain_scheduled = False
+
+    def _drain(self):
+        with self._lock:
+            batch = self._pending
+            self._pending = deque()
+            self._drain_scheduled = False
+
+        for payment_hash, event_id, update in batch:
+            try:
+                self.deliver(payment_hash, event_id, update)
+            except Exception as e:
+                logging.error(f"Failed to deliver SSE update for {payment_hash}: {e}")
+
+
+loop_bridge = LoopBridge(deliver_to_local_clients)
+
+# Carries updates to every worker serving SSE (see SSE_BROKER)
+broker = create_broker(loop_bridge.submit)
+
+
 def notify_clients_of_payment_status(
     payment_hash: str,
     status: str = "paid",
@@ -86,9 +270,6 @@ def notify_clients_of_payment_status(
     tweet_url: Optional[str] = None,
 ):
     """Send payment status update to all connected clients"""
-    if payment_hash not in connections:
-        return
-    
     payload = {
         "payment_hash": payment_hash,
         "status": status,
@@ -102,44 +283,60 @@ def notify_clients_of_payment_status(
     # Create the message only once
     update = json.dumps(payload)
 
-    dead_connections = []
-    for conn in connections[payment_hash]:
-        try:
-            conn.queue.put_nowait(update)
-        except Exception as e:
-            logging.error(f"Failed to send message to client: {e}")
-            dead_connections.append(conn)
+    try:
+        broker.publish(payment_hash, update)
+    except Exception as e:
+        logging.error(f"Failed to publish payment status for {payment_hash}: {e}")
+
 
-    # Clean up any dead connections
-    if dead_connections:
-        connections[payment_hash] = [conn for conn in connections[payment_hash] if conn not in dead_connections]
-        if not connections[payment_hash]:
-            del connections[payment_hash]
+def expire_due_connections(now: float) -> int:
+    """Close every connection whose deadline has passed. Returns how many were still open."""
+    global _stale_expiry_entries
+    expired = 0
+    while expiry_heap and expiry_heap[0][0] <= now:
+        _, _, payment_hash, connection = heapq.heappop(expiry_heap)
+        if not is_registered(payment_hash, connection):
+            _stale_expiry_entries = max(_stale_expiry_entries - 1, 0)
+            continue  # already disconnected
+        remove_connection(payment_hash, connection)
+        connection.put(CLOSE_STREAM)
+        expired += 1
+    return expired
 
 
-async def cleanup_stale_connections():
-    """Remove connections that are older than 30 minutes"""
+async def expire_connections():
+    """Close connections after SSE_CONNECTION_TTL_SECONDS, sleeping until the earliest deadline"""
+    global _expiry_wakeup
+    _expiry_wakeup = Event()
     while True:
         try:
-            now = datetime.now()
-            timeout = timedelta(minutes=30)
+            expired = expire_due_connections(time.monotonic())
+            if expired:
+                logging.info(f"Closed {expired} expired SSE connections")
 
-            for payment_hash in list(connections.keys()):
-                # Remove old connections
-                stale_connections = [conn for conn in connections[payment_hash] if (now - conn.connected_at) > timeout]
-
-                if stale_connections:
-                    connections[payment_hash] = [
-                        conn for conn in connections[payment_hash] if conn not in stale_connections
-                    ]
-                    logging.info(f"Removed {len(stale_connections)} stale connections for {payment_hash}")
-
-                # Remove empty payment_hash entries
-                if not connections[payment_hash]:
-                    del connections[payment_hash]
-                    logging.info(f"Removed empty payment_hash entry: {payment_hash}")
-
-            await sleep(300)  # Run cleanup every 5 minutes
+            _expiry_wakeup.clear()
+            if expiry_heap:
+                timeout = max(expiry_heap[0][0] - time.monotonic(), 0)
+            else:
+                timeout = None  # nothing to expire until the next subscription
+            try:
+                await wait_for(_expiry_wakeup.wait(), timeout=timeout)
+            except TimeoutError:
+                pass
         except Exception as e:
-            logging.error(f"Error in cleanup_stale_connections: {e}")
+            logging.error(f"Error in expire_connections: {e}")
             await sleep(60)  # Wait a minute before retrying if there's an error
+
+
+@router.get("/metrics")
+async def get_sse_metrics():
+    queue_depths = [conn.queue.qsize() for subscribers in connections.values() for conn in subscribers]
+    return {
+        "connections": len(queue_depths),
+        "payment_hashes": len(connections),
+        "queued_events": sum(queue_depths),
+        "max_queue_depth": max(queue_depths, default=0),
+        "replay_payment_hashes": len(recent_events),
+        "expiry_heap_size": len(expiry_heap),
+        "stale_expiry_entries": _stale_expiry_entries,
+    }
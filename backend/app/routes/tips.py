@@ -1,50 +1,48 @@
+import json
 import logging
-from datetime import datetime, timedelta, timezone
+from datetime import date
+from typing import Optional
 
 from config import settings
-from db import get_db
-from fastapi import APIRouter, Depends, HTTPException
+from db import dialect_insert, get_async_db
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from models.db import Tip, Tweet, User
-from schemas.tip import LeaderboardReceived, LeaderboardSent, TipCreate, TipInvoice, TipOut, TipSummary
-from services.lightning_service import create_invoice
-from services.twitter_service import get_avatars_for_usernames
-from sqlalchemy import func
-from sqlalchemy.orm import Session, aliased
+from schemas.tip import (
+    LeaderboardReceived,
+    LeaderboardSent,
+    TipCreate,
+    TipInvoice,
+    TipOut,
+    TipOutPage,
+    TipSummary,
+    TipSummaryPage,
+)
+from services.leaderboard_service import (
+    leaderboard_cache,
+    leaderboard_window_start,
+    most_active_tippers_query,
+    most_tipped_users_query,
+)
+from services.lightning_service import breez_health, create_invoice_async, invoice_pool
+from services.twitter_service import aget_avatars_for_usernames
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from utils.pagination import next_page, paginate_newest_first
 from utils.security import get_current_user
 from utils.tweet_data_extract import extract_username_and_tweet_id
 
 router = APIRouter(prefix="/tips", tags=["tips"])
 
-User2 = aliased(User)
+Sender = aliased(User)
+Recipient = aliased(User)
 
 
-# most tipped users
-@router.get("/leaderboard_received", response_model=list[LeaderboardReceived])
-def get_most_tipped_users(db: Session = Depends(get_db)):
-    timerange = datetime.now(timezone.utc) - timedelta(days=settings.LEADERBOARD_CALCULATION_WINDOW_DAYS)
-
-    tips = (
-        db.query(
-            User.twitter_username.label("tip_recipient"),
-            func.count(Tip.id).label("tip_count"),
-            func.sum(Tip.amount_sats).label("total_amount_sats"),
-        )
-        .join(Tweet, Tweet.id == Tip.tweet_id)
-        .join(User, User.id == Tweet.tweet_author)
-        .filter(
-            Tip.tip_sender.is_not(None),  # Exclude anonymous tips
-            Tip.paid_in.is_(True),
-            Tip.created_at >= timerange,
-            Tip.tip_sender != Tweet.tweet_author,  # Exclude self-tips
-        )
-        .group_by(User.twitter_username)
-        .order_by(func.sum(Tip.amount_sats).desc())
-        .limit(10)
-        .all()
-    )
+async def _most_tipped_users_json(db: AsyncSession, since: date) -> bytes:
+    tips = (await db.execute(most_tipped_users_query(since))).all()
     usernames = [t.tip_recipient for t in tips]
 
-    avatars_map = get_avatars_for_usernames(usernames, db)
+    avatars_map = await aget_avatars_for_usernames(usernames, db)
 
     result = []
     for t in tips:
@@ -55,36 +53,16 @@ def get_most_tipped_users(db: Session = Depends(get_db)):
                 total_amount_sats=t.total_amount_sats,
                 tip_count=t.tip_count,
                 avatar_url=avatar_url,
-            )
+            ).dict()
         )
-    return result
+    return json.dumps(result).encode("utf-8")
 
 
-# biggest tippers
-@router.get("/leaderboard_sent", response_model=list[LeaderboardSent])
-def get_most_active_tippers(db: Session = Depends(get_db)):
-    timerange = datetime.now(timezone.utc) - timedelta(days=settings.LEADERBOARD_CALCULATION_WINDOW_DAYS)
-
-    tips = (
-        db.query(
-            User.twitter_username.label("tip_sender"),
-            func.count(Tip.id).label("tip_count"),
-            func.sum(Tip.amount_sats).label("total_amount_sats"),
-        )
-        .join(Tip, User.id == Tip.tip_sender)
-        .filter(
-            Tip.tip_sender.is_not(None),  # Exclude anonymous tips
-            Tip.paid_in.is_(True),  # Only tips that have been paid in
-            Tip.created_at >= timerange,
-        )
-        .group_by(User.twitter_username)
-        .order_by(func.sum(Tip.amount_sats).desc())
-        .limit(10)
-        .all()
-    )
+async def _most_active_tippers_json(db: AsyncSession, since: date) -> bytes:
+    tips = (await db.execute(most_active_tippers_query(since))).all()
     usernames = [t.tip_sender for t in tips]
 
-    avatars_map = get_avatars_for_usernames(usernames, db)
+    avatars_map = await aget_avatars_for_usernames(usernames, db)
 
     result = []
     for t in tips:
@@ -95,51 +73,81 @@ def get_most_active_tippers(db: Session = Depends(get_db)):
                 total_amount_sats=t.total_amount_sats,
                 tip_count=t.tip_count,
                 avatar_url=avatar_url,
-            )
+            ).dict()
         )
+    return json.dumps(result).encode("utf-8")
+
+
+# most tipped users
+@router.get("/leaderboard_received", response_model=list[LeaderboardReceived])
+async def get_most_tipped_users(db: AsyncSession = Depends(get_async_db)):
+    since = leaderboard_window_start()
+    body = await leaderboard_cache.get_or_set_async(
+        ("leaderboard_received", since), lambda: _most_tipped_users_json(db, since)
+    )
+    return Response(content=body, media_type="application/json")
 
-    return result
+
+# biggest tippers
+@router.get("/leaderboard_sent", response_model=list[LeaderboardSent])
+async def get_most_active_tippers(db: AsyncSession = Depends(get_async_db)):
+    since = leaderboard_window_start()
+    body = await leaderboard_cache.get_or_set_async(
+        ("leaderboard_sent", since), lambda: _most_active_tippers_json(db, since)
+    )
+    return Response(content=body, media_type="application/json")
+
+
+async def _get_or_create_tweet_author(db: AsyncSession, username: str, tweet_id: int) -> User:
+    """Return the author of the tweet, creating the (unregistered) user and tweet rows if needed"""
+    tweet = await db.get(Tweet, tweet_id)
+    if tweet:
+        return await db.get(User, tweet.tweet_author)
+
+    # Upserts instead of row locks: concurrent tips on a new tweet don't wait on each other
+    insert = dialect_insert(db)
+    await db.execute(
+        insert(User)
+        .values(twitter_username=username, is_registered=False)
+        .on_conflict_do_nothing(index_elements=[User.twitter_username])
+    )
+    receiver = (await db.execute(select(User).where(User.twitter_username == username))).scalar_one()
+    await db.execute(
+        insert(Tweet).values(id=tweet_id, tweet_author=receiver.id).on_conflict_do_nothing(index_elements=[Tweet.id])
+    )
+    return receiver
 
 
 @router.post("/", response_model=TipInvoice)
-def create_tip(
+async def create_tip(
     tip_data: TipCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_async_db),
     current_user: User = Depends(get_current_user),
 ):
     try:
-        # Start transaction
-        with db.begin_nested():
-            username, tweet_id = extract_username_and_tweet_id(tip_data.tweet_url)
-            username = username.lower()
-
-            if username.lower() == current_user.twitter_username.lower():
-                raise HTTPException(status_code=400, detail="You cannot tip yourself.")
-
-            # Lock the rows we're going to update
-            tweet = db.query(Tweet).filter(Tweet.id == tweet_id).with_for_update().first()
-
-            if not tweet:
-                receiver = db.query(User).filter(User.twitter_username == username).with_for_update().first()
-
-                if not receiver:
-                    receiver = User(twitter_username=username, is_registered=False)
-                    db.add(receiver)
-                    db.flush()
-
-                tweet = Tweet(
-                    id=tweet_id,
-                    tweet_author=receiver.id,
-                )
-                db.add(tweet)
-                db.flush()
-            else:
-                receiver = tweet.author
-
-        payment_hash, bolt11_invoice = create_invoice(
-            tip_data.amount_sats,
-            f"⚡⚡ for https://x.com/{username}/status/{tweet_id}",
-        )
+        username, tweet_id = extract_username_and_tweet_id(tip_data.tweet_url)
+        username = username.lower()
+
+        if username.lower() == current_user.twitter_username.lower():
+            raise HTTPException(status_code=400, detail="You cannot tip yourself.")
+
+        if not breez_health.connected:
+            raise HTTPException(status_code=503, detail="Lightning node is connecting, please try again shortly.")
+
+        receiver = await _get_or_create_tweet_author(db, username, tweet_id)
+        has_wallet_address = bool(receiver.wallet_address)
+        # Commit before talking to the node so no transaction is held open across the Lightning round trip
+        await db.commit()
+
+        # Preset amounts are usually served from the pool; anything else gets a fresh invoice
+        pooled_invoice = invoice_pool.take(tip_data.amount_sats)
+        if pooled_invoice:
+            payment_hash, bolt11_invoice = pooled_invoice
+        else:
+            payment_hash, bolt11_invoice = await create_invoice_async(
+                tip_data.amount_sats,
+                f"⚡⚡ for https://x.com/{username}/status/{tweet_id}",
+            )
 
         new_tip = Tip(
             tip_sender=current_user.id,
@@ -147,13 +155,11 @@ def create_tip(
             ln_payment_hash=payment_hash,
             comment=tip_data.comment,
             amount_sats=tip_data.amount_sats,
-            created_at=datetime.now(timezone.utc),
             gif_url=tip_data.gif_url,
         )
 
         db.add(new_tip)
-        db.commit()
-        db.refresh(new_tip)
+        await db.commit()
         logging.info(f"New tip created: {new_tip.id} for tweet {tweet_id}")
 
         return TipInvoice(
@@ -162,95 +168,127 @@ def create_tip(
             amount_sats=new_tip.amount_sats,
             bolt11_invoice=bolt11_invoice,
             payment_hash=payment_hash,
-            has_wallet_address=bool(receiver.wallet_address),
+            has_wallet_address=has_wallet_address,
         )
 
     except HTTPException as http_exc:
         logging.error(f"HTTP error occurred: {http_exc.detail}")
         raise
+    except TimeoutError:
+        logging.error(f"Timed out creating invoice for tweet {tweet_id}")
+        raise HTTPException(status_code=504, detail="Timed out creating the Lightning invoice.")
     except Exception as e:
         logging.error(f"Unexpected error occurred: {e}")
         raise HTTPException(status_code=400, detail=f"Failed to create tip. Reason: {str(e)}")
 
 
-@router.get("/", response_model=list[TipOut])
-def list_tips(db: Session = Depends(get_db)):
+@router.get("/", response_model=TipOutPage)
+async def list_tips(
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.TIPS_PAGE_SIZE_DEFAULT, ge=1, le=settings.TIPS_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
     # Order tips from new to old
-    return db.query(Tip).order_by(Tip.created_at.desc()).all()
+    stmt = paginate_newest_first(select(Tip), Tip.created_at, Tip.id, cursor, limit)
+    tips, next_cursor = next_page((await db.execute(stmt)).scalars().all(), limit)
+    return TipOutPage(items=tips, next_cursor=next_cursor)
 
 
 @router.get("/{tip_id}", response_model=TipOut)
-def get_tip(tip_id: int, db: Session = Depends(get_db)):
-    tip = db.query(Tip).filter(Tip.id == tip_id).first()
+async def get_tip(tip_id: int, db: AsyncSession = Depends(get_async_db)):
+    tip = await db.get(Tip, tip_id)
     if not tip:
         raise HTTPException(status_code=404, detail="Tip not found.")
     return tip
 
 
-@router.get("/sent/{username}", response_model=list[TipSummary])
-def get_sent_tips_by_username(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(func.lower(User.twitter_username) == username.lower()).first()
+def _tip_summary_select():
+    """Project only the columns TipSummary needs, with sender and recipient joined in the same round trip."""
+    return (
+        select(
+            Tip.id,
+            Tip.created_at,
+            Tip.amount_sats,
+            Tip.tweet_id,
+            Tip.reply_tweet_id,
+            Tip.comment,
+            Sender.twitter_username.label("tip_sender"),
+            Recipient.twitter_username.label("recipient"),
+        )
+        .join(Tweet, Tweet.id == Tip.tweet_id)
+        .join(Recipient, Recipient.id == Tweet.tweet_author)
+        .outerjoin(Sender, Sender.id == Tip.tip_sender)
+        .where(Tip.paid_in.is_(True))
+    )
+
+
+@router.get("/sent/{username}", response_model=TipSummaryPage)
+async def get_sent_tips_by_username(
+    username: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.TIPS_PAGE_SIZE_DEFAULT, ge=1, le=settings.TIPS_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    result = await db.execute(select(User).where(func.lower(User.twitter_username) == username.lower()))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=400, detail="User not found.")
 
-    tips = (
-        db.query(Tip)  # Query the full Tip model instead of individual fields
-        .join(User, User.id == Tip.tip_sender)
-        .join(Tweet, Tweet.id == Tip.tweet_id)
-        .join(User2, User2.id == Tweet.tweet_author)
-        .filter(Tip.tip_sender == user.id, Tip.paid_in.is_(True))
-        .order_by(Tip.created_at.desc())
-        .all()
-    )
+    stmt = _tip_summary_select().where(Tip.tip_sender == user.id)
+    stmt = paginate_newest_first(stmt, Tip.created_at, Tip.id, cursor, limit)
+    tips, next_cursor = next_page((await db.execute(stmt)).all(), limit)
 
-    recipient_usernames = [tip.tweet.author.twitter_username for tip in tips]
-    avatars_map = get_avatars_for_usernames(recipient_usernames, db)
+    recipient_usernames = [tip.recipient for tip in tips]
+    avatars_map = await aget_avatars_for_usernames(recipient_usernames, db)
 
-    return [
+    items = [
         TipSummary(
-            tip_sender=tip.sender.twitter_username if tip.sender else None,
-            recipient=tip.tweet.author.twitter_username,
+            tip_sender=tip.tip_sender,
+            recipient=tip.recipient,
             amount_sats=tip.amount_sats,
             created_at=tip.created_at,
             tweet_id=tip.tweet_id,
             reply_tweet_id=tip.reply_tweet_id,
-            avatar_url=avatars_map.get(tip.tweet.author.twitter_username),
+            avatar_url=avatars_map.get(tip.recipient),
             comment=tip.comment,
             tip_type="sent",
         )
         for tip in tips
     ]
+    return TipSummaryPage(items=items, next_cursor=next_cursor)
 
 
-@router.get("/received/{username}", response_model=list[TipSummary])
-def get_received_tips_by_username(username: str, db: Session = Depends(get_db)):
-    user = db.query(User).filter(func.lower(User.twitter_username) == username.lower()).first()
+@router.get("/received/{username}", response_model=TipSummaryPage)
+async def get_received_tips_by_username(
+    username: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(settings.TIPS_PAGE_SIZE_DEFAULT, ge=1, le=settings.TIPS_PAGE_SIZE_MAX),
+    db: AsyncSession = Depends(get_async_db),
+):
+    result = await db.execute(select(User).where(func.lower(User.twitter_username) == username.lower()))
+    user = result.scalars().first()
     if not user:
         raise HTTPException(status_code=400, detail="User not found.")
 
-    tips = (
-        db.query(Tip)
-        .join(Tweet, Tweet.id == Tip.tweet_id)
-        .join(User, User.id == Tweet.tweet_author)
-        .filter(Tweet.tweet_author == user.id, Tip.paid_in.is_(True))
-        .order_by(Tip.created_at.desc())  # Order from new to old
-        .all()
-    )
+    stmt = _tip_summary_select().where(Tweet.tweet_author == user.id)
+    stmt = paginate_newest_first(stmt, Tip.created_at, Tip.id, cursor, limit)  # Order from new to old
+    tips, next_cursor = next_page((await db.execute(stmt)).all(), limit)
 
-    sender_usernames = [tip.sender.twitter_username for tip in tips if tip.sender is not None]
-    avatars_map = get_avatars_for_usernames(sender_usernames, db)
+    sender_usernames = [tip.tip_sender for tip in tips if tip.tip_sender is not None]
+    avatars_map = await aget_avatars_for_usernames(sender_usernames, db)
 
-    return [
+    items = [
         TipSummary(
-            tip_sender=tip.sender.twitter_username if tip.sender else None,
+            tip_sender=tip.tip_sender,
             amount_sats=tip.amount_sats,
             created_at=tip.created_at,
             tweet_id=tip.tweet_id,
             reply_tweet_id=tip.reply_tweet_id,
             recipient=username,
-            avatar_url=avatars_map.get(tip.sender.twitter_username) if tip.sender else None,
+            avatar_url=avatars_map.get(tip.tip_sender) if tip.tip_sender else None,
             comment=tip.comment,
             tip_type="received",
         )
         for tip in tips
     ]
+    return TipSummaryPage(items=items, next_cursor=next_cursor)
@@ -4,7 +4,7 @@ from db import get_db
 from fastapi import APIRouter, Depends, HTTPException
 from models.db import User
 from schemas.user import UserCreate, UserLimitedOut, UserOut, UserUpdate
-from services.lightning_service import forward_pending_tips_for_user
+from services.payout_service import forward_pending_tips_for_user
 from services.twitter_service import get_avatars_for_usernames
 from sqlalchemy import func
 from sqlalchemy.orm import Session
@@ -41,7 +41,7 @@ def update_user_profile(
 
     if updated and user.wallet_address:
         logging.info(
-            f"User @{user.twitter_username} updated their wallet address. Initiating forwarding of pending tips."
+            f"User @{user.twitter_username} updated their wallet address. Queueing forwarding of pending tips."
         )
         forward_pending_tips_for_user(user.id, db)
     return user
@@ -36,6 +36,11 @@ class TipOut(BaseModel):
         orm_mode = True
 
 
+class TipOutPage(BaseModel):
+    items: list[TipOut]
+    next_cursor: Optional[str] = None
+
+
 class TipUpdate(BaseModel):
     paid_in: bool
     paid_out: bool
@@ -70,6 +75,11 @@ class TipSummary(BaseModel):
         orm_mode = True
 
 
+class TipSummaryPage(BaseModel):
+    items: list[TipSummary]
+    next_cursor: Optional[str] = None
+
+
 class TipInvoice(BaseModel):
     tip_id: str
     tip_recipient: str
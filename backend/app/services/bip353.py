@@ -2,6 +2,7 @@ import urllib.parse
 
 import dns.resolver
 import requests
+from utils.http_client import http_session
 
 # we store the payout address as user@domain in the database
 # when it comes time to do a payment(user@domain):
@@ -58,7 +59,7 @@ def resolve_recipient_via_lud16(user_domain):
         url = f"https://{domain}/.well-known/lnurlp/{username}"
         print(f"{url}")
         # Perform the HTTP GET request
-        response = requests.get(url, timeout=2)
+        response = http_session.get(url, timeout=2)
 
         # Check for a valid response with required fields
         if response.status_code == 200:
@@ -0,0 +1,270 @@
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import BinaryIO, Dict, Optional
+
+from config import settings
+from db import SessionLocal, dialect_insert
+from models.db import GifMedia
+from sqlalchemy import select, update
+
+# Names of the files in the cache directory
+DIGEST_LENGTH = 64
+PARTIAL_SUFFIX = ".part"
+# Temp files older than this were left by a download that died; younger ones may belong to another process
+STALE_PARTIAL_SECONDS = 3600
+
+
+class GifCacheWriter:
+    """
+    Tees a GIF that is being downloaded into a temporary file and hashes it on the way.
+    commit() files it under its sha256. Any filesystem error only disables caching, never the upload or the hash.
+    """
+
+    def __init__(self, cache: "GifDiskCache"):
+        self.cache = cache
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._file: Optional[BinaryIO] = None
+        try:
+            self._file = tempfile.NamedTemporaryFile(dir=cache.directory, suffix=PARTIAL_SUFFIX, delete=False)
+        except OSError as e:
+            logging.warning(f"[gif_cache] Not caching GIF, can't create a file in {cache.directory}: {e}")
+
+    def write(self, data: memoryview) -> None:
+        self._hash.update(data)
+        self.size += len(data)
+        if self._file is None:
+            return
+        try:
+            self._file.write(data)
+        except OSError as e:
+            logging.warning(f"[gif_cache] Not caching GIF, write failed: {e}")
+            self.discard()
+
+    def commit(self) -> str:
+        """Returns the content sha256, whether or not the file made it into the cache."""
+        digest = self._hash.hexdigest()
+        if self._file is not None:
+            try:
+                self._file.close()
+                self.cache.add(self._file.name, digest, self.size)
+                self._file = None
+            except OSError as e:
+                logging.warning(f"[gif_cache] Not caching GIF {digest}: {e}")
+                self.discard()
+        return digest
+
+    def discard(self) -> None:
+        if self._file is None:
+            return
+        try:
+            self._file.close()
+            os.remove(self._file.name)
+        except OSError:
+            pass
+        self._file = None
+
+
+class GifDiskCache:
+    """
+    Content-addressed GIF files in a directory, each named by the sha256 of its bytes.
+    Least recently used files are evicted once the total passes max_bytes. The index is rebuilt from the
+    directory (by mtime) on first use, so the cache survives restarts. Thread-safe.
+    """
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.evictions = 0
+        self._files: "OrderedDict[str, int]" = OrderedDict()  # sha256 -> size, least recently used first
+        self._total_bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+
+    def _load(self) -> None:
+        if self._loaded:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        found = []
+        stale_before = time.time() - STALE_PARTIAL_SECONDS
+        for entry in os.scandir(self.directory):
+            try:
+                stat = entry.stat()
+                if entry.name.endswith(PARTIAL_SUFFIX):
+                    if stat.st_mtime < stale_before:
+                        os.remove(entry.path)  # left over from an interrupted download
+                elif entry.is_file() and len(entry.name) == DIGEST_LENGTH:
+                    found.append((stat.st_mtime, entry.name, stat.st_size))
+            except OSError:
+                continue  # removed concurrently by another process
+        for _, digest, size in sorted(found):
+            self._files[digest] = size
+            self._total_bytes += size
+        self._loaded = True
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.directory, digest)
+
+    def open(self, digest: str) -> Optional[BinaryIO]:
+        """The cached file for digest, or None if it isn't cached or the cache is unusable."""
+        try:
+            with self._lock:
+                self._load()
+                if digest not in self._files:
+                    return None
+                self._files.move_to_end(digest)
+        except OSError as e:
+            logging.warning(f"[gif_cache] Cache directory {self.directory} unavailable: {e}")
+            return None
+
+        path = self._path(digest)
+        try:
+            file = open(path, "rb")
+            os.utime(path)  # keep the LRU order across restarts
+        except OSError:
+            with self._lock:
+                size = self._files.pop(digest, None)
+                if size is not None:
+                    self._total_bytes -= size
+            return None
+        return file
+
+    def writer(self) -> GifCacheWriter:
+        """A writer for a new GIF; if the cache directory can't be written it only hashes."""
+        try:
+            with self._lock:
+                self._load()
+        except OSError as e:
+            logging.warning(f"[gif_cache] Cache directory {self.directory} unavailable: {e}")
+        return GifCacheWriter(self)
+
+    def add(self, temp_path: str, digest: str, size: int) -> None:
+        os.replace(temp_path, self._path(digest))
+        with self._lock:
+            self._total_bytes += size - self._files.pop(digest, 0)
+            self._files[digest] = size
+            evicted = []
+            while self._total_bytes > self.max_bytes and len(self._files) > 1:
+                old_digest, old_size = self._files.popitem(last=False)
+                self._total_bytes -= old_size
+                evicted.append(old_digest)
+            self.evictions += len(evicted)
+
+        for old_digest in evicted:
+            try:
+                os.remove(self._path(old_digest))
+            except OSError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"files": len(self._files), "bytes": self._total_bytes, "evictions": self.evictions}
+
+
+gif_disk_cache = GifDiskCache(settings.GIF_CACHE_DIR, settings.GIF_CACHE_MAX_BYTES)
+
+# Lookups by outcome: "media" reused an uploaded media_id, "disk" uploaded from the local copy, "miss" downloaded
+_lookups: Dict[str, int] = {"media": 0, "disk": 0, "miss": 0}
+_lookups_lock = threading.Lock()
+
+
+def record_lookup(outcome: str) -> None:
+    with _lookups_lock:
+        _lookups[outcome] += 1
+
+
+def gif_cache_stats() -> Dict[str, object]:
+    with _lookups_lock:
+        lookups = dict(_lookups)
+    total = sum(lookups.values())
+    return {
+        "lookups": total,
+        "media_id_hits": lookups["media"],
+        "disk_hits": lookups["disk"],
+        "misses": lookups["miss"],
+        "media_id_hit_rate": lookups["media"] / total if total else 0.0,
+        "hit_rate": (lookups["media"] + lookups["disk"]) / total if total else 0.0,
+        "disk": {**gif_disk_cache.stats(), "max_bytes": gif_disk_cache.max_bytes},
+    }
+
+
+def get_gif_media(gif_url: str) -> Optional[GifMedia]:
+    with SessionLocal() as db:
+        return db.get(GifMedia, gif_url)
+
+
+def reusable_media_id(gif: GifMedia) -> Optional[str]:
+    """The uploaded media_id, unless it expires within GIF_MEDIA_REUSE_MARGIN_SECONDS"""
+    if not gif.media_id or gif.media_expires_at is None:
+        return None
+    expires_at = gif.media_expires_at
+    if expires_at.tzinfo is None:
+        expires_at = expires_at.replace(tzinfo=timezone.utc)
+    margin = timedelta(seconds=settings.GIF_MEDIA_REUSE_MARGIN_SECONDS)
+    if expires_at - margin <= datetime.now(timezone.utc):
+        return None
+    return gif.media_id
+
+
+def get_reusable_media_id(content_sha256: str) -> Optional[str]:
+    """An unexpired media_id of these bytes, whichever URL they were uploaded from; the longest-lived one wins"""
+    with SessionLocal() as db:
+        uploads = db.scalars(
+            select(GifMedia).where(GifMedia.content_sha256 == content_sha256, GifMedia.media_id.is_not(None))
+        ).all()
+    reusable = [(gif.media_expires_at, media_id) for gif in uploads if (media_id := reusable_media_id(gif))]
+    return max(reusable)[1] if reusable else None
+
+
+def remember_gif_media(
+    gif_url: str,
+    content_sha256: str,
+    content_type: str,
+    size_bytes: int,
+    media_id: str,
+    expires_after_secs: Optional[int],
+) -> None:
+    """Upsert the GIF's upload; with no expires_after_secs the media_id is recorded but not reused yet."""
+    media_expires_at = None
+    if expires_after_secs is not None:
+        media_expires_at = datetime.now(timezone.utc) + timedelta(seconds=expires_after_secs)
+    values = {
+        "gif_url": gif_url,
+        "content_sha256": content_sha256,
+        "content_type": content_type,
+        "size_bytes": size_bytes,
+        "media_id": media_id,
+        "media_expires_at": media_expires_at,
+    }
+    with SessionLocal() as db:
+        insert = dialect_insert(db)
+        stmt = insert(GifMedia).values(**values)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[GifMedia.gif_url],
+            set_={
+                **{key: stmt.excluded[key] for key in values if key != "gif_url"},
+                "updated_at": datetime.now(timezone.utc),
+            },
+        )
+        db.execute(stmt)
+        db.commit()
+
+
+def mark_gif_media_ready(media_id: str, expires_after_secs: int) -> None:
+    """Make a media_id that finished processing reusable until it expires."""
+    with SessionLocal() as db:
+        db.execute(
+            update(GifMedia)
+            .where(GifMedia.media_id == media_id)
+            .values(
+                media_expires_at=datetime.now(timezone.utc) + timedelta(seconds=expires_after_secs),
+                updated_at=datetime.now(timezone.utc),
+            )
+        )
+        db.commit()
@@ -0,0 +1,114 @@
+import logging
+from collections import defaultdict
+from datetime import date, datetime, timedelta, timezone
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import settings
+from db import dialect_insert
+from models.db import User, UserTipStats
+from sqlalchemy import Select, func, select
+from sqlalchemy.orm import Session
+from utils.cache import TTLCache
+
+LEADERBOARD_SIZE = 10
+
+# Serialized leaderboard responses, keyed by (endpoint, window start)
+leaderboard_cache = TTLCache(settings.LEADERBOARD_CACHE_TTL_SECONDS)
+
+
+def tip_day(created_at: Optional[datetime]) -> date:
+    created_at = created_at or datetime.now(timezone.utc)
+    if created_at.tzinfo is not None:
+        created_at = created_at.astimezone(timezone.utc)
+    return created_at.date()
+
+
+def record_paid_tips(db: Session, paid_tips: Iterable[Tuple[Optional[int], Optional[int], int, date]]) -> None:
+    """
+    Add freshly paid tips, given as (sender_id, recipient_id, amount_sats, day), to the daily leaderboard buckets.
+    Must run in the same transaction that flips paid_in so the totals never drift.
+    Anonymous tips are not counted, and self-tips only count towards the sender's total.
+    Tips are summed per (user, day) first and written with one multi-row upsert.
+    """
+    # (user_id, day) -> [received_sats, received_count, sent_sats, sent_count]
+    totals: Dict[Tuple[int, date], List[int]] = defaultdict(lambda: [0, 0, 0, 0])
+    for sender_id, recipient_id, amount_sats, day in paid_tips:
+        if sender_id is None:
+            continue
+        sent = totals[(sender_id, day)]
+        sent[2] += amount_sats
+        sent[3] += 1
+        if recipient_id is not None and recipient_id != sender_id:
+            received = totals[(recipient_id, day)]
+            received[0] += amount_sats
+            received[1] += 1
+
+    if not totals:
+        return
+
+    insert = dialect_insert(db)
+    stmt = insert(UserTipStats).values(
+        [
+            {
+                "user_id": user_id,
+                "day": day,
+                "received_sats": received_sats,
+                "received_count": received_count,
+                "sent_sats": sent_sats,
+                "sent_count": sent_count,
+            }
+            for (user_id, day), (received_sats, received_count, sent_sats, sent_count) in totals.items()
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[UserTipStats.user_id, UserTipStats.day],
+        set_={
+            "received_sats": UserTipStats.received_sats + stmt.excluded.received_sats,
+            "received_count": UserTipStats.received_count + stmt.excluded.received_count,
+            "sent_sats": UserTipStats.sent_sats + stmt.excluded.sent_sats,
+            "sent_count": UserTipStats.sent_count + stmt.excluded.sent_count,
+        },
+    )
+    db.execute(stmt)
+
+    logging.info(f"[leaderboard] Recorded paid tips into {len(totals)} daily buckets")
+
+
+def invalidate_leaderboards() -> None:
+    leaderboard_cache.invalidate()
+
+
+def leaderboard_window_start() -> date:
+    return (datetime.now(timezone.utc) - timedelta(days=settings.LEADERBOARD_CALCULATION_WINDOW_DAYS)).date()
+
+
+def most_tipped_users_query(since: date, limit: int = LEADERBOARD_SIZE) -> Select:
+    total = func.sum(UserTipStats.received_sats)
+    return (
+        select(
+            User.twitter_username.label("tip_recipient"),
+            func.sum(UserTipStats.received_count).label("tip_count"),
+            total.label("total_amount_sats"),
+        )
+        .join(User, User.id == UserTipStats.user_id)
+        .where(UserTipStats.day >= since, UserTipStats.received_count > 0)
+        .group_by(User.twitter_username)
+        .order_by(total.desc())
+        .limit(limit)
+    )
+
+
+def most_active_tippers_query(since: date, limit: int = LEADERBOARD_SIZE) -> Select:
+    total = func.sum(UserTipStats.sent_sats)
+    return (
+        select(
+            User.twitter_username.label("tip_sender"),
+            func.sum(UserTipStats.sent_count).label("tip_count"),
+            total.label("total_amount_sats"),
+        )
+        .join(User, User.id == UserTipStats.user_id)
+        .where(UserTipStats.day >= since, UserTipStats.sent_count > 0)
+        .group_by(User.twitter_username)
+        .order_by(total.desc())
+        .limit(limit)
+    )
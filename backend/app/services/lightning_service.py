@@ -1,5 +1,13 @@
+import asyncio
+import hashlib
 import logging
+import random
 import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import Callable, Deque, Dict, List, Optional, Tuple
 
 import breez_sdk
 from breez_sdk import (
@@ -12,12 +20,12 @@ from breez_sdk import (
 )
 from config import settings
 from db import SessionLocal
-from models.db import Tip, Tweet, User
-from routes.sse import notify_clients_of_payment_status
-from services.twitter_service import post_gif_to_twitter, post_reply_to_twitter_with_comment
+from models.db import Tip
+from services.twitter_service import bot_tweet_url, post_reply_to_twitter_with_comment
+from utils.cache import TTLCache
+from utils.http_client import http_session
 
 # from services.twitter_service import post_reply_to_twitter_with_comment
-from sqlalchemy.orm import Session
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
 logging.getLogger().setLevel(logging.INFO)
@@ -25,6 +33,12 @@ logging.getLogger().setLevel(logging.INFO)
 # Optional: define a global variable for 'sdk_services'
 sdk_services = None
 
+# Bounds concurrent receive_payment round trips (see create_invoice_async)
+invoice_executor = ThreadPoolExecutor(max_workers=settings.INVOICE_CREATE_CONCURRENCY, thread_name_prefix="invoice")
+
+# LNURL-pay metadata per normalized wallet address (see get_lnurl_pay_data)
+lnurl_pay_cache = TTLCache(settings.LNURL_PAY_CACHE_TTL_SECONDS)
+
 
 def send_bolt12_payment(bolt12_offer: str, amount_sats: int):
     pass
@@ -53,34 +67,92 @@ def calculate_amount_to_send_sats(amount_sats: int):
     return int(amount_sats - fees)
 
 
-def send_lnurl_payment(lnurl_address: str, amount_sats: int, sender_username: str):
+def normalize_lnurl_address(lnurl_address: str) -> str:
+    """Cache key for a wallet address: the domain of a lightning address is case-insensitive, bech32 LNURLs entirely."""
+    address = lnurl_address.strip()
+    if "@" in address:
+        user, domain = address.rsplit("@", 1)
+        return f"{user}@{domain.lower()}"
+    return address.lower()
+
+
+def get_lnurl_pay_data(lnurl_address: str) -> breez_sdk.LnUrlPayRequestData:
+    """
+    Resolve the LNURL-pay metadata for a wallet address, cached for LNURL_PAY_CACHE_TTL_SECONDS.
+    Failures are cached for LNURL_PAY_NEGATIVE_CACHE_TTL_SECONDS and re-raised without another fetch.
+    """
+    key = normalize_lnurl_address(lnurl_address)
+    cached = lnurl_pay_cache.get(key)
+    if isinstance(cached, Exception):
+        raise cached
+    if cached is not None:
+        return cached
+
     try:
         parsed_input = breez_sdk.parse_input(lnurl_address)
-        if isinstance(parsed_input, breez_sdk.InputType.LN_URL_PAY):
-            amount_msat = calculate_amount_to_send_sats(amount_sats) * 1000
-            use_trampoline = True
-            comment = f"⚡⚡ ZapZap from @{sender_username}"
-
-            req = breez_sdk.LnUrlPayRequest(
-                data=parsed_input.data,
-                amount_msat=amount_msat,
-                use_trampoline=use_trampoline,
-                comment=comment,
-            )
-
-            pay_res = sdk_services.pay_lnurl(req)
-            logging.info("LNURL Payment successful")
-            payment_hash = pay_res.data.payment.details.data.payment_hash
-            return payment_hash
-            # return pay_res.data.payment.payment_hash
-        else:
-            logging.error("Provided input is not LNURL-PAY type.")
+        if not isinstance(parsed_input, breez_sdk.InputType.LN_URL_PAY):
+            raise ValueError(f"Provided input is not LNURL-PAY type: {lnurl_address}")
     except Exception as error:
-        logging.error(f"Error sending LNURL payment: {error}")
+        lnurl_pay_cache.set(key, error, ttl_seconds=settings.LNURL_PAY_NEGATIVE_CACHE_TTL_SECONDS)
+        raise
+
+    lnurl_pay_cache.set(key, parsed_input.data)
+    return parsed_input.data
+
+
+def lnurl_pay_comment(sender_username: str) -> str:
+    return f"⚡⚡ ZapZap from @{sender_username}"
+
+
+def request_lnurl_invoice(lnurl_address: str, amount_sats: int, sender_username: str) -> breez_sdk.LnInvoice:
+    """
+    Ask the wallet's LNURL-pay callback for an invoice, checked against the amount and metadata.
+    Fetched here rather than through pay_lnurl so the payment hash is known, and recorded, before paying.
+    """
+    data = get_lnurl_pay_data(lnurl_address)
+    amount_msat = calculate_amount_to_send_sats(amount_sats) * 1000
+    if not data.min_sendable <= amount_msat <= data.max_sendable:
+        raise ValueError(
+            f"{amount_msat} msat is outside the sendable range {data.min_sendable}-{data.max_sendable} "
+            f"of {lnurl_address}"
+        )
+
+    params = {"amount": amount_msat}
+    if data.comment_allowed:
+        params["comment"] = lnurl_pay_comment(sender_username)[: data.comment_allowed]
+    try:
+        response = http_session.get(data.callback, params=params)
+        response.raise_for_status()
+        body = response.json()
+        if body.get("status") == "ERROR":
+            raise ValueError(f"LNURL callback of {lnurl_address} refused the payment: {body.get('reason')}")
+        invoice = breez_sdk.parse_invoice(body["pr"])
+    except Exception:
+        # The callback may have moved; fetch fresh metadata on the next attempt
+        lnurl_pay_cache.invalidate(normalize_lnurl_address(lnurl_address))
         raise
 
+    if invoice.amount_msat != amount_msat:
+        raise ValueError(f"Invoice from {lnurl_address} is for {invoice.amount_msat} msat, expected {amount_msat}")
+    metadata_hash = hashlib.sha256(data.metadata_str.encode("utf-8")).hexdigest()
+    if invoice.description_hash and invoice.description_hash != metadata_hash:
+        raise ValueError(f"Invoice from {lnurl_address} does not commit to the LNURL metadata")
+    return invoice
+
+
+def get_payment(payment_hash: str) -> Optional[breez_sdk.Payment]:
+    """The node's record of a payment, or None if it never saw one with this hash."""
+    if not sdk_services:
+        raise RuntimeError("Breez SDK not connected yet. Call connect_breez() first.")
+    return sdk_services.payment_by_hash(payment_hash)
 
-def forward_payment_to_receiver(tip_id: int):
+
+def forward_payment_to_receiver(tip_id: int, before_paying: Optional[Callable[[str], None]] = None):
+    """
+    Pay the tip (minus fees) to the recipient's wallet address.
+    before_paying is called with the payment hash once the invoice is known and before any sats are sent;
+    if it raises, nothing is paid.
+    """
     with SessionLocal() as db:
         # Initial checks
         tip = db.query(Tip).filter(Tip.id == tip_id).first()
@@ -104,14 +176,10 @@ def forward_payment_to_receiver(tip_id: int):
         receiver = tip.tweet.author
         sender = tip.sender
 
+        # The GIF is posted by the payout job before forwarding (see payout_service.post_tip_gif)
         tweet_url = None
-
-        # Only post reply if we haven't paid out yet
-        if not tip.paid_out:
-            try:
-                tweet_url = post_gif_to_twitter(db, tip)
-            except Exception as e:
-                logging.warning(f"Failed to post Twitter reply for tip {tip_id}: {e}")
+        if tip.reply_tweet_id:
+            tweet_url = bot_tweet_url(tip.reply_tweet_id)
 
         # If we have a tweet URL but no wallet address, return the tweet URL with a None payment hash
         if tweet_url and (not receiver or not receiver.wallet_address):
@@ -128,94 +196,43 @@ def forward_payment_to_receiver(tip_id: int):
         address_str = receiver.wallet_address
         logging.info(f"Forwarding {tip.amount_sats} sats to @{receiver.twitter_username} at address {address_str}")
 
-        # First attempt - original case as stored
-        try:
-            logging.info(f"[LNURL] Attempting LNURL pay for original case: {address_str}")
-            payment_hash = send_lnurl_payment(address_str, tip.amount_sats, sender.twitter_username)
-
-            # Recheck paid status before marking as paid
-            db.refresh(tip)
-            if tip.paid_out:
-                logging.warning(f"Tip {tip_id} was marked as paid during processing. Skipping payment confirmation.")
-                return tip.forward_payment_hash, tweet_url
-
-            if payment_hash:
-                tip.forward_payment_hash = payment_hash
-                tip.paid_out = True
-                db.commit()
-                logging.info(f"Successfully forwarded {tip.amount_sats} sats to @{receiver.twitter_username}")
-                return payment_hash, tweet_url
-        except Exception as e:
-            logging.info(f"Payment failed with original case, trying lowercase: {e}")
-
-        # Second attempt - lowercase
-        try:
-            lowercase_address = address_str.lower()
-            if lowercase_address == address_str:
-                logging.info("Address is already lowercase, skipping second attempt")
-                return None, tweet_url  # Return the tweet URL even if payment fails
-
-            logging.info(f"[LNURL] Attempting LNURL pay for lowercase: {lowercase_address}")
-
-            # Double check paid status again before second attempt
-            db.refresh(tip)
-            if tip.paid_out:
-                logging.warning(f"Tip {tip_id} was marked as paid during processing. Skipping second attempt.")
-                return tip.forward_payment_hash, tweet_url
-
-            payment_hash = send_lnurl_payment(address_str, tip.amount_sats, sender.twitter_username)
-            if payment_hash:
-                tip.forward_payment_hash = payment_hash
-                tip.paid_out = True
-                db.commit()
-                logging.info(
-                    f"Successfully forwarded {tip.amount_sats} sats to @{receiver.twitter_username} using lowercase address"
-                )
-                return payment_hash, tweet_url
-        except Exception as e:
-            logging.error(f"Payment failed with both cases: {e}")
-
-        logging.error(f"No payment options found for sending {tip.amount_sats} sats to @{receiver.twitter_username}")
-        return None, tweet_url  # Return tweet_url even if payment fails
-
+        # Try the address as stored, then lowercased. Only fetching the invoice is retried: once a payment
+        # was sent it is never followed by a second one here.
+        invoice = None
+        for address in dict.fromkeys([address_str, address_str.lower()]):
+            try:
+                logging.info(f"[LNURL] Requesting invoice from {address}")
+                invoice = request_lnurl_invoice(address, tip.amount_sats, sender.twitter_username)
+                break
+            except Exception as e:
+                logging.info(f"[LNURL] No invoice from {address}: {e}")
 
-def forward_pending_tips_for_user(user_id: int, db: Session):
-    user = db.query(User).filter(User.id == user_id).first()
-    if not user or not user.wallet_address:
-        logging.error(f"User ID {user_id} does not exist or lacks a wallet address")
-        return
-    pending_tips = (
-        db.query(Tip)
-        .join(Tweet, Tweet.id == Tip.tweet_id)
-        .filter(
-            Tweet.tweet_author == user.id,
-            Tip.paid_in.is_(True),
-            Tip.paid_out.is_(False),
-        )
-        .all()
-    )
+        if invoice is None:
+            logging.error(
+                f"No payment options found for sending {tip.amount_sats} sats to @{receiver.twitter_username}"
+            )
+            return None, tweet_url  # Return tweet_url even if payment fails
 
-    if not pending_tips:
-        logging.info(f"No pending tips to forward to the user {user.twitter_username}")
-        return
+        # Recheck paid status before paying
+        db.refresh(tip)
+        if tip.paid_out:
+            logging.warning(f"Tip {tip_id} was marked as paid during processing. Skipping payment.")
+            return tip.forward_payment_hash, tweet_url
 
-    logging.info(f"Found {len(pending_tips)} pending tips for user {user.twitter_username}")
+        if before_paying:
+            before_paying(invoice.payment_hash)
 
-    for tip in pending_tips:
         try:
-            payment_hash = forward_payment_to_receiver(tip.id)
-            if payment_hash:
-                tip.forward_payment_hash = payment_hash
-                tip.paid_out = True
-                db.commit()
-                logging.info(
-                    f"Successfully forwarded {tip.amount_sats} sats for the Tip #{tip.id} to {user.wallet_address}"
-                )
-            else:
-                logging.error(f"Failed to forward Tip #{tip.id} for user {user.twitter_username}")
-
+            sdk_services.send_payment(breez_sdk.SendPaymentRequest(bolt11=invoice.bolt11, use_trampoline=True))
         except Exception as e:
-            logging.error(f"Exception occured while forwarding tip #{tip.id}: {e}")
+            logging.error(f"Error sending LNURL payment {invoice.payment_hash}: {e}")
+            return None, tweet_url
+
+        tip.forward_payment_hash = invoice.payment_hash
+        tip.paid_out = True
+        db.commit()
+        logging.info(f"Successfully forwarded {tip.amount_sats} sats to @{receiver.twitter_username}")
+        return invoice.payment_hash, tweet_url
 
 
 class MyGreenlightListener(EventListener):
@@ -224,81 +241,11 @@ class MyGreenlightListener(EventListener):
             payment_hash = sdk_event.details.payment_hash
             logging.info(f"[MyGreenlightListener] Payment received, hash={payment_hash}")
 
-            with SessionLocal() as db:
-                tip = (
-                    db.query(Tip)
-                    .filter(Tip.ln_payment_hash == payment_hash)
-                    .with_for_update()  # Lock the row
-                    .first()
-                )
-
-                if not tip:
-                    logging.warning(f"[MyGreenlightListener] Tip not found for hash={payment_hash}")
-                    return
-
-                if tip.paid_out:
-                    logging.info(f"[MyGreenlightListener] Tip #{tip.id} already paid out, skipping.")
-                    notify_clients_of_payment_status(payment_hash)  # Add notification
-                    return
+            # Imported here: payment_ingest builds on this module
+            from services.payment_ingest import paid_invoice_batcher
 
-                was_unpaid = not tip.paid_in
-                if was_unpaid:
-                    tip.paid_in = True
-                    db.commit()
-                    logging.info(f"[MyGreenlightListener] Marked tip #{tip.id} as paid_in.")
-
-                    # Notify clients that payment was received
-                    notify_clients_of_payment_status(payment_hash)
-
-                    def forward_and_notify():
-                        try:
-                            # First notify clients that payment was received (just once)
-                            notify_clients_of_payment_status(
-                                payment_hash, status="paid", message="Payment received successfully"
-                            )
-
-                            # Then attempt to post GIF and forward payment
-                            result = forward_payment_to_receiver(tip.id)
-
-                            # Check if we got a result with a tweet URL
-                            if isinstance(result, tuple) and result[1]:  # Check if second element (tweet_url) exists
-                                forward_hash, tweet_url = result
-
-                                # Send notification with GIF tweet URL
-                                logging.info(f"Sending SSE notification with GIF tweet URL: {tweet_url}")
-                                notify_clients_of_payment_status(
-                                    payment_hash,  # Use original payment hash
-                                    status="gif_ready",  # New status for GIF
-                                    message="GIF posted successfully",
-                                    tweet_url=tweet_url,
-                                )
-                            # If no wallet address, tweet_url is still set but payment fails
-                            elif result is None:
-                                # Try to get the tweet_url directly from the tip
-                                if tip.reply_tweet_id:
-                                    # Construct URL if we have a reply_tweet_id
-                                    tweet_url = f"https://twitter.com/ZapZapBot/status/{tip.reply_tweet_id}/photo/1"
-                                    logging.info(
-                                        f"Payment failed but GIF was posted. Sending SSE with URL: {tweet_url}"
-                                    )
-
-                                    # Send notification with just the GIF URL
-                                    notify_clients_of_payment_status(
-                                        payment_hash,
-                                        status="gif_ready",
-                                        message="GIF posted but payment failed (no wallet address)",
-                                        tweet_url=tweet_url,
-                                    )
-                        except Exception as e:
-                            logging.error(f"Error in forward_and_notify: {e}")
-
-                    # Only spawn forwarding thread if we just marked it as paid
-                    t = threading.Thread(target=forward_and_notify)
-                    t.start()
-                    logging.info(f"[MyGreenlightListener] Spawned thread to forward tip #{tip.id}")
-                else:
-                    logging.info(f"[MyGreenlightListener] Tip #{tip.id} was already paid_in, skipping.")
-                    notify_clients_of_payment_status(payment_hash)  # Add notification
+            # Marked paid, recorded and queued for payout in batches off the SDK thread
+            paid_invoice_batcher.submit(payment_hash)
 
 
 class BreezLogger(breez_sdk.LogStream):
@@ -308,8 +255,39 @@ class BreezLogger(breez_sdk.LogStream):
             print("Received log [", log.level, "]: ", log.line)
 
 
+breez_logging_initialized = False
+
+
 def init_breez_logging():
+    # The SDK only accepts one log stream per process (startup can run more than once, e.g. in tests)
+    global breez_logging_initialized
+    if breez_logging_initialized:
+        return
     breez_sdk.set_log_stream(BreezLogger())
+    breez_logging_initialized = True
+
+
+class BreezHealth:
+    """Connection state of the Breez node, cheap to read from request handlers and health checks."""
+
+    def __init__(self):
+        self.connected = False
+        self.connecting = False
+        self.attempts = 0
+        self.last_error: Optional[str] = None
+        self.connected_at: Optional[datetime] = None
+
+    def as_dict(self) -> dict:
+        return {
+            "connected": self.connected,
+            "connecting": self.connecting,
+            "attempts": self.attempts,
+            "last_error": self.last_error,
+            "connected_at": self.connected_at.isoformat() if self.connected_at else None,
+        }
+
+
+breez_health = BreezHealth()
 
 
 def connect_breez(restore_only: bool = True):
@@ -317,9 +295,11 @@ def connect_breez(restore_only: bool = True):
     Connects to the Breez node and sets up the Breez services globally.
     - If this is your first time, set restore_only=False to create a new node.
     - If you already have a node, set restore_only=True to reconnect.
+    Blocks for the whole handshake; from async code use connect_breez_with_retry().
     """
 
     global sdk_services
+    breez_health.attempts += 1
     seed = mnemonic_to_seed(settings.BREEZ_MNEMONIC)
 
     # Build the Breez config
@@ -336,34 +316,168 @@ def connect_breez(restore_only: bool = True):
         my_listener = MyGreenlightListener()
         connect_request = ConnectRequest(config, seed, restore_only=restore_only)
         sdk_services = breez_sdk.connect(connect_request, my_listener)
+        breez_health.connected = True
+        breez_health.connected_at = datetime.now(timezone.utc)
+        breez_health.last_error = None
         logging.info("Breez SDK connected successfully.")
         return True
 
     except Exception as e:
         logging.error(f"Error connecting to Breez: {e}")
         sdk_services = None
+        breez_health.connected = False
+        breez_health.last_error = str(e)
         return False
 
 
-def create_invoice(amount_sats: int, description: str = "Tip invoice"):
+async def connect_breez_with_retry(restore_only: bool = True):
     """
-    Creates a lightning invoice. Returns the BOLT11 invoice string.
+    Connect in a worker thread so the event loop keeps serving requests, retrying with jittered exponential
+    backoff (BREEZ_CONNECT_RETRY_BASE_SECONDS doubling up to BREEZ_CONNECT_RETRY_MAX_SECONDS) until it succeeds.
+    """
+    breez_health.connecting = True
+    try:
+        failures = 0
+        # Carried forward and doubled rather than computed from failures, so a long outage can't overflow it
+        backoff = settings.BREEZ_CONNECT_RETRY_BASE_SECONDS
+        while True:
+            try:
+                connected = await asyncio.to_thread(connect_breez, restore_only)
+            except Exception as e:
+                # e.g. an invalid mnemonic or config; keep retrying so /health/ready can recover
+                logging.error(f"Error connecting to Breez: {e}")
+                breez_health.last_error = str(e)
+                connected = False
+            if connected:
+                logging.info(f"Breez connected after {failures + 1} attempt(s).")
+                return
+
+            delay = min(backoff, settings.BREEZ_CONNECT_RETRY_MAX_SECONDS)
+            delay *= random.uniform(0.5, 1.5)  # spread out replicas restarting together
+            backoff = min(backoff * 2, settings.BREEZ_CONNECT_RETRY_MAX_SECONDS)
+            failures += 1
+            logging.info(f"Retrying Breez connection in {delay:.1f} seconds...")
+            await asyncio.sleep(delay)
+    finally:
+        breez_health.connecting = False
+
+
+def request_invoice(amount_sats: int, description: str = "Tip invoice", expiry: Optional[int] = None):
+    """
+    Asks the node for a new invoice. Returns the breez_sdk.LnInvoice.
     """
     if not sdk_services:
         raise RuntimeError("Breez SDK not connected yet. Call connect_breez() first.")
 
-    req = breez_sdk.ReceivePaymentRequest(amount_sats * 1000, description=description)
+    req = breez_sdk.ReceivePaymentRequest(amount_msat=amount_sats * 1000, description=description, expiry=expiry)
 
     res = sdk_services.receive_payment(req)
     try:
-        bolt11_invoice = res.ln_invoice.bolt11  # Access the ln_invoice attribute
-        payment_hash = res.ln_invoice.payment_hash  # Access the payment_hash attribute
+        return res.ln_invoice  # Access the ln_invoice attribute
     except AttributeError as e:
         print(f"Error accessing response attributes: {e}")
         raise RuntimeError("Failed to parse response from receive_payment")
 
+
+def create_invoice(amount_sats: int, description: str = "Tip invoice"):
+    """
+    Creates a lightning invoice. Returns the payment hash and the BOLT11 invoice string.
+    """
+    ln_invoice = request_invoice(amount_sats, description)
+
     # Return the invoice and payment hash
-    return payment_hash, bolt11_invoice
+    return ln_invoice.payment_hash, ln_invoice.bolt11
+
+
+class InvoicePool:
+    """
+    Keeps INVOICE_POOL_SIZE ready-made invoices for each amount in INVOICE_POOL_AMOUNTS, so POST /tips/
+    for a preset amount skips the receive_payment round trip. A background thread tops the pool up and
+    drops invoices that are within INVOICE_POOL_EXPIRY_MARGIN_SECONDS of their BOLT11 expiry.
+    Pooled invoices carry a generic description since the tweet isn't known when they are created.
+    """
+
+    def __init__(self, amounts: List[int], size: int):
+        self.size = size
+        self._invoices: Dict[int, Deque[Tuple[float, str, str]]] = {amount: deque() for amount in amounts}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        if not self._invoices or self._thread:
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, name="invoice-pool", daemon=True)
+        self._thread.start()
+        logging.info(f"[InvoicePool] Pooling {self.size} invoices for amounts {sorted(self._invoices)}")
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self._wakeup.set()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def take(self, amount_sats: int) -> Optional[Tuple[str, str]]:
+        """Returns (payment_hash, bolt11) of a pooled invoice, or None if the amount isn't pooled or ran out."""
+        invoices = self._invoices.get(amount_sats)
+        if invoices is None:
+            return None
+
+        usable_until = time.time() + settings.INVOICE_POOL_EXPIRY_MARGIN_SECONDS
+        with self._lock:
+            while invoices:
+                expires_at, payment_hash, bolt11 = invoices.popleft()
+                if expires_at > usable_until:
+                    self._wakeup.set()  # refill the slot
+                    return payment_hash, bolt11
+        self._wakeup.set()
+        return None
+
+    def _refill(self) -> None:
+        usable_until = time.time() + settings.INVOICE_POOL_EXPIRY_MARGIN_SECONDS
+        for amount, invoices in self._invoices.items():
+            with self._lock:
+                while invoices and invoices[0][0] <= usable_until:
+                    invoices.popleft()
+                missing = self.size - len(invoices)
+
+            for _ in range(missing):
+                if self._stopping.is_set() or not sdk_services:
+                    return
+                ln_invoice = request_invoice(
+                    amount, "⚡⚡ ZapZap tip", expiry=settings.INVOICE_POOL_INVOICE_EXPIRY_SECONDS
+                )
+                with self._lock:
+                    invoices.append(
+                        (ln_invoice.timestamp + ln_invoice.expiry, ln_invoice.payment_hash, ln_invoice.bolt11)
+                    )
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                self._refill()
+            except Exception as e:
+                logging.error(f"[InvoicePool] Refill failed: {e}")
+            self._wakeup.wait(timeout=settings.INVOICE_POOL_REFILL_INTERVAL_SECONDS)
+            self._wakeup.clear()
+
+
+invoice_pool = InvoicePool(settings.INVOICE_POOL_AMOUNTS, settings.INVOICE_POOL_SIZE)
+
+
+async def create_invoice_async(amount_sats: int, description: str = "Tip invoice"):
+    """
+    create_invoice() on the invoice executor, so neither the event loop nor a DB transaction waits on the node.
+    At most INVOICE_CREATE_CONCURRENCY calls run at once; raises TimeoutError after INVOICE_CREATE_TIMEOUT_SECONDS.
+    """
+    loop = asyncio.get_running_loop()
+    return await asyncio.wait_for(
+        loop.run_in_executor(invoice_executor, create_invoice, amount_sats, description),
+        timeout=settings.INVOICE_CREATE_TIMEOUT_SECONDS,
+    )
 
 
 # def mark_invoice_as_paid_in_db(invoice_or_hash: str):
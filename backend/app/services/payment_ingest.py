@@ -0,0 +1,249 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+
+import breez_sdk
+from config import settings
+from db import SessionLocal
+from models.db import SyncCheckpoint, Tip, Tweet
+from routes.sse import notify_clients_of_payment_status
+from services import lightning_service
+from services.leaderboard_service import invalidate_leaderboards, record_paid_tips, tip_day
+from services.payout_service import enqueue_payout, payout_workers
+from sqlalchemy import select, update
+
+RECONCILE_CHECKPOINT = "breez_received_payments"
+
+
+def mark_tips_paid(payment_hashes: Iterable[str]) -> List[str]:
+    """
+    Flip paid_in for every unpaid tip among the payment hashes, record them on the leaderboards and queue
+    their payouts, all in one transaction. Idempotent: hashes that are unknown or already paid are ignored.
+    Returns the payment hashes that were newly marked paid.
+    """
+    hashes = set(payment_hashes)
+    if not hashes:
+        return []
+
+    with SessionLocal() as db:
+        # The paid_in = false guard makes concurrent or replayed batches claim each tip at most once
+        paid = db.execute(
+            update(Tip)
+            .where(Tip.ln_payment_hash.in_(hashes), Tip.paid_in.is_(False))
+            .values(paid_in=True)
+            .returning(Tip.id, Tip.ln_payment_hash, Tip.tip_sender, Tip.tweet_id, Tip.amount_sats, Tip.created_at)
+        ).all()
+        if not paid:
+            return []
+
+        tweet_ids = {tip.tweet_id for tip in paid}
+        authors: Dict[int, int] = dict(
+            db.execute(select(Tweet.id, Tweet.tweet_author).where(Tweet.id.in_(tweet_ids))).all()
+        )
+        record_paid_tips(
+            db,
+            ((tip.tip_sender, authors.get(tip.tweet_id), tip.amount_sats, tip_day(tip.created_at)) for tip in paid),
+        )
+        for tip in paid:
+            enqueue_payout(db, tip.id)
+        db.commit()
+
+    invalidate_leaderboards()
+    payout_workers.wake(all_workers=True)
+    logging.info(f"[payment_ingest] Marked {len(paid)} tips as paid_in: {[tip.id for tip in paid]}")
+    return [tip.ln_payment_hash for tip in paid]
+
+
+def ingest_paid_invoices(payment_hashes: List[str]) -> None:
+    newly_paid = set(mark_tips_paid(payment_hashes))
+
+    # Repeat events for tips that were already paid still notify, so a reconnecting client hears the outcome;
+    # hashes that match no tip (e.g. invoices not created for a tip) don't
+    repeated = set(payment_hashes) - newly_paid
+    already_paid = set()
+    if repeated:
+        with SessionLocal() as db:
+            already_paid = set(
+                db.execute(select(Tip.ln_payment_hash).where(Tip.ln_payment_hash.in_(repeated), Tip.paid_in.is_(True)))
+                .scalars()
+                .all()
+            )
+        for payment_hash in repeated - already_paid:
+            logging.info(f"[payment_ingest] No tip for hash={payment_hash}, ignoring")
+
+    for payment_hash in dict.fromkeys(payment_hashes):
+        if payment_hash in newly_paid or payment_hash in already_paid:
+            notify_clients_of_payment_status(payment_hash, status="paid", message="Payment received successfully")
+
+
+class PaidInvoiceBatcher:
+    """
+    Collects INVOICE_PAID payment hashes from the Breez SDK thread and processes them in batches on its own thread,
+    so the SDK callback returns immediately and a replayed backlog becomes a few UPDATEs instead of one per event.
+    A batch closes PAID_INVOICE_BATCH_WINDOW_SECONDS after its first event or at PAID_INVOICE_BATCH_MAX hashes.
+    """
+
+    def __init__(self):
+        self._pending: Dict[str, None] = {}  # insertion-ordered set; duplicates coalesce
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+
+    def start(self) -> None:
+        with self._condition:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="paid-invoice-batcher", daemon=True)
+            self._thread.start()
+        logging.info("Paid invoice batcher started")
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def submit(self, payment_hash: str) -> None:
+        with self._condition:
+            self._pending[payment_hash] = None
+            self._condition.notify()
+
+    def _next_batch(self) -> Optional[List[str]]:
+        with self._condition:
+            while not self._pending and not self._stopping:
+                self._condition.wait()
+
+            deadline = time.monotonic() + settings.PAID_INVOICE_BATCH_WINDOW_SECONDS
+            while len(self._pending) < settings.PAID_INVOICE_BATCH_MAX and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+
+            if not self._pending:
+                return None  # stopping
+            batch = list(self._pending)[: settings.PAID_INVOICE_BATCH_MAX]
+            for payment_hash in batch:
+                del self._pending[payment_hash]
+            return batch
+
+    def _run(self) -> None:
+        failures = 0
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            try:
+                ingest_paid_invoices(batch)
+                failures = 0
+            except Exception as e:
+                failures += 1
+                if failures > settings.PAID_INVOICE_MAX_RETRIES:
+                    # Still paid on the node, so reconcile_paid_invoices() picks them up on its next run
+                    logging.error(
+                        f"[payment_ingest] Giving up on {len(batch)} paid invoices after {failures} failures, "
+                        f"leaving them to reconciliation: {e}"
+                    )
+                    failures = 0
+                    continue
+
+                delay = min(settings.PAID_INVOICE_RETRY_BASE_SECONDS * 2 ** (failures - 1), 60)
+                logging.error(
+                    f"[payment_ingest] Failed to process {len(batch)} paid invoices, retrying in {delay}s: {e}"
+                )
+                with self._condition:
+                    for payment_hash in batch:
+                        self._pending.setdefault(payment_hash, None)
+                    self._condition.wait_for(lambda: self._stopping, timeout=delay)
+
+
+paid_invoice_batcher = PaidInvoiceBatcher()
+
+
+def received_payment_hashes(from_timestamp: int, to_timestamp: int) -> Iterable[List[str]]:
+    """Yield the hashes of completed incoming payments in the window, one page of the node's history at a time."""
+    offset = 0
+    while True:
+        payments = lightning_service.sdk_services.list_payments(
+            breez_sdk.ListPaymentsRequest(
+                filters=[breez_sdk.PaymentTypeFilter.RECEIVED],
+                from_timestamp=from_timestamp,
+                to_timestamp=to_timestamp,
+                include_failures=False,
+                offset=offset,
+                limit=settings.PAYMENT_RECONCILE_PAGE_SIZE,
+            )
+        )
+        yield [
+            payment.details.data.payment_hash
+            for payment in payments
+            if payment.status == breez_sdk.PaymentStatus.COMPLETE
+            and isinstance(payment.details, breez_sdk.PaymentDetails.LN)
+        ]
+        if len(payments) < settings.PAYMENT_RECONCILE_PAGE_SIZE:
+            return
+        offset += len(payments)
+
+
+def reconcile_paid_invoices() -> int:
+    """
+    Catch up on invoices paid while we weren't listening (process down, SDK reconnecting).
+    Pages through the node's received payments since the last checkpoint, picks out the ones whose tip is still
+    unpaid and runs them through the normal paid pipeline. Returns how many tips were recovered.
+    """
+    now = int(time.time())
+    with SessionLocal() as db:
+        checkpoint = db.get(SyncCheckpoint, RECONCILE_CHECKPOINT)
+        synced_until = (
+            checkpoint.synced_until if checkpoint else now - settings.PAYMENT_RECONCILE_INITIAL_LOOKBACK_SECONDS
+        )
+
+    # Overlap the previous window: payments can land in the node's history slightly out of order
+    from_timestamp = max(synced_until - settings.PAYMENT_RECONCILE_OVERLAP_SECONDS, 0)
+
+    recovered = 0
+    for page in received_payment_hashes(from_timestamp, now):
+        if not page:
+            continue
+        with SessionLocal() as db:
+            # IN lookup on the indexed ln_payment_hash column; only this page's hashes are held in memory
+            missed = (
+                db.execute(select(Tip.ln_payment_hash).where(Tip.ln_payment_hash.in_(page), Tip.paid_in.is_(False)))
+                .scalars()
+                .all()
+            )
+        if missed:
+            logging.warning(f"[reconcile] Found {len(missed)} paid invoices that were never marked paid_in")
+            ingest_paid_invoices(missed)
+            recovered += len(missed)
+
+    with SessionLocal() as db:
+        checkpoint = db.get(SyncCheckpoint, RECONCILE_CHECKPOINT)
+        if checkpoint:
+            checkpoint.synced_until = now
+        else:
+            db.add(SyncCheckpoint(name=RECONCILE_CHECKPOINT, synced_until=now))
+        db.commit()
+
+    logging.info(f"[reconcile] Payments reconciled up to {now}, recovered {recovered} tips")
+    return recovered
+
+
+async def run_payment_reconciliation() -> None:
+    """Reconcile once the node is connected, then every PAYMENT_RECONCILE_INTERVAL_SECONDS."""
+    while True:
+        if lightning_service.sdk_services is None:
+            await asyncio.sleep(5)
+            continue
+
+        try:
+            await asyncio.to_thread(reconcile_paid_invoices)
+        except Exception as e:
+            logging.error(f"[reconcile] Payment reconciliation failed: {e}")
+        await asyncio.sleep(settings.PAYMENT_RECONCILE_INTERVAL_SECONDS)
@@ -0,0 +1,412 @@
+import logging
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, Optional, Set, Tuple
+
+import breez_sdk
+from config import settings
+from db import SessionLocal, dialect_insert
+from models.db import PayoutJob, Tip, Tweet, User
+from routes.sse import notify_clients_of_payment_status
+from services.lightning_service import forward_payment_to_receiver, get_payment
+from services.twitter_service import MediaProcessing, post_gif_to_twitter
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+JOB_PENDING = "pending"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class PayoutRetry(Exception):
+    """The payout did not complete and should be attempted again later."""
+
+
+def enqueue_payout(db: Session, tip_id: int) -> None:
+    """Add a payout job for the tip; call inside the transaction that marks it paid_in."""
+    db.add(PayoutJob(tip_id=tip_id, status=JOB_PENDING))
+
+
+def forward_pending_tips_for_user(user_id: int, db: Session) -> int:
+    """
+    Queue payouts for every paid tip still owed to the user, e.g. after they set a wallet address.
+    Jobs that already finished or gave up are reset; running jobs are left alone. Returns the number of tips queued.
+    """
+    user = db.query(User).filter(User.id == user_id).first()
+    if not user or not user.wallet_address:
+        logging.error(f"User ID {user_id} does not exist or lacks a wallet address")
+        return 0
+
+    pending_tip_ids = [
+        tip_id
+        for (tip_id,) in db.query(Tip.id)
+        .join(Tweet, Tweet.id == Tip.tweet_id)
+        .filter(
+            Tweet.tweet_author == user.id,
+            Tip.paid_in.is_(True),
+            Tip.paid_out.is_(False),
+        )
+        .all()
+    ]
+
+    if not pending_tip_ids:
+        logging.info(f"No pending tips to forward to the user {user.twitter_username}")
+        return 0
+
+    now = datetime.now(timezone.utc)
+    insert = dialect_insert(db)
+    stmt = insert(PayoutJob).values(
+        [
+            {"tip_id": tip_id, "status": JOB_PENDING, "attempts": 0, "next_attempt_at": now, "created_at": now}
+            for tip_id in pending_tip_ids
+        ]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[PayoutJob.tip_id],
+        set_={
+            "status": JOB_PENDING,
+            "attempts": 0,
+            "next_attempt_at": now,
+            "last_error": None,
+            "updated_at": now,
+        },
+        where=PayoutJob.status != JOB_RUNNING,
+    )
+    db.execute(stmt)
+    db.commit()
+
+    payout_workers.wake(all_workers=True)
+    logging.info(f"Queued {len(pending_tip_ids)} pending tips for user {user.twitter_username}")
+    return len(pending_tip_ids)
+
+
+def retry_delay(attempts: int) -> timedelta:
+    seconds = settings.PAYOUT_RETRY_BASE_SECONDS * 2 ** max(attempts - 1, 0)
+    return timedelta(seconds=min(seconds, settings.PAYOUT_RETRY_MAX_SECONDS))
+
+
+def claim_next_job() -> Optional[Tuple[int, int]]:
+    """
+    Claim the next due job and mark it running. Returns (job_id, tip_id) or None.
+    Workers renew the lock of the jobs they run (see renew_job_locks), so a job whose lock is older than
+    PAYOUT_JOB_LOCK_TIMEOUT_SECONDS belongs to a worker that died and is claimed again.
+    FOR UPDATE SKIP LOCKED lets several workers (and replicas) poll the table without claiming the same row.
+    """
+    now = datetime.now(timezone.utc)
+    stale_before = now - timedelta(seconds=settings.PAYOUT_JOB_LOCK_TIMEOUT_SECONDS)
+    with SessionLocal() as db:
+        job = (
+            db.query(PayoutJob)
+            .filter(
+                or_(
+                    and_(PayoutJob.status == JOB_PENDING, PayoutJob.next_attempt_at <= now),
+                    and_(PayoutJob.status == JOB_RUNNING, PayoutJob.locked_at < stale_before),
+                )
+            )
+            .order_by(PayoutJob.next_attempt_at)
+            .with_for_update(skip_locked=True)
+            .first()
+        )
+        if not job:
+            return None
+        if job.status == JOB_RUNNING:
+            logging.warning(f"[payout] Reclaiming job #{job.id} for tip #{job.tip_id}, locked since {job.locked_at}")
+
+        job.status = JOB_RUNNING
+        job.locked_at = now
+        job.attempts += 1
+        db.commit()
+        return job.id, job.tip_id
+
+
+def renew_job_locks(job_ids: Iterable[int]) -> None:
+    """Push locked_at forward on jobs this process is still running, so claim_next_job doesn't take them over."""
+    with SessionLocal() as db:
+        db.query(PayoutJob).filter(PayoutJob.id.in_(list(job_ids)), PayoutJob.status == JOB_RUNNING).update(
+            {PayoutJob.locked_at: datetime.now(timezone.utc)}, synchronize_session=False
+        )
+        db.commit()
+
+
+def finish_job(job_id: int, error: Optional[str] = None) -> None:
+    with SessionLocal() as db:
+        job = db.query(PayoutJob).filter(PayoutJob.id == job_id).first()
+        if not job:
+            return
+
+        job.locked_at = None
+        if error is None:
+            job.status = JOB_DONE
+            job.last_error = None
+        elif job.attempts >= settings.PAYOUT_MAX_ATTEMPTS:
+            job.status = JOB_FAILED
+            job.last_error = error
+            logging.error(f"[payout] Job #{job_id} for tip #{job.tip_id} failed after {job.attempts} attempts: {error}")
+        else:
+            job.status = JOB_PENDING
+            job.last_error = error
+            job.next_attempt_at = datetime.now(timezone.utc) + retry_delay(job.attempts)
+            logging.warning(
+                f"[payout] Job #{job_id} for tip #{job.tip_id} will retry at {job.next_attempt_at}: {error}"
+            )
+        db.commit()
+
+
+def wait_for_media(job_id: int, check_after_secs: int) -> bool:
+    """
+    Park the job until Twitter should be done processing its GIF, freeing the worker in the meantime.
+    The next run polls STATUS for the media_id saved on the job; waiting doesn't count as a failed attempt.
+    Returns False, dropping the media_id, once it has been polled GIF_MEDIA_MAX_PROCESSING_POLLS times.
+    """
+    with SessionLocal() as db:
+        job = db.query(PayoutJob).filter(PayoutJob.id == job_id).first()
+        if not job:
+            return True
+
+        if job.media_polls >= settings.GIF_MEDIA_MAX_PROCESSING_POLLS:
+            logging.error(
+                f"[payout] Giving up on the GIF for tip #{job.tip_id}: media {job.media_id} still processing "
+                f"after {job.media_polls} checks"
+            )
+            job.media_id = None
+            job.media_polls = 0
+            db.commit()
+            return False
+
+        job.status = JOB_PENDING
+        job.locked_at = None
+        job.attempts = max(job.attempts - 1, 0)
+        job.media_polls += 1
+        job.next_attempt_at = datetime.now(timezone.utc) + timedelta(seconds=check_after_secs)
+        db.commit()
+        logging.info(f"[payout] Job #{job_id} for tip #{job.tip_id} waits {check_after_secs}s for media {job.media_id}")
+        return True
+
+
+def post_tip_gif(job_id: int, tip_id: int) -> Optional[MediaProcessing]:
+    """
+    Post the tip's GIF unless it was posted already, and tell the payer's client where it is.
+    Returns MediaProcessing if Twitter is still processing the upload; its media_id is kept on the job.
+    """
+    with SessionLocal() as db:
+        tip = db.query(Tip).filter(Tip.id == tip_id).first()
+        if not tip or tip.reply_tweet_id or not tip.tweet or not tip.gif_url:
+            return None
+
+        job = db.query(PayoutJob).filter(PayoutJob.id == job_id).first()
+        try:
+            tweet_url = post_gif_to_twitter(db, tip, processing_media_id=job.media_id if job else None)
+        except MediaProcessing as processing:
+            if job and job.media_id != processing.media_id:
+                job.media_id = processing.media_id
+                job.media_polls = 0
+                db.commit()
+            return processing
+        except Exception as e:
+            logging.warning(f"Failed to post Twitter reply for tip {tip_id}: {e}")
+            tweet_url = None
+
+        if job and job.media_id:
+            job.media_id = None
+            job.media_polls = 0
+            db.commit()
+
+        if tweet_url:
+            receiver = tip.tweet.author
+            if receiver and receiver.wallet_address:
+                message = "GIF posted successfully"
+            else:
+                message = "GIF posted but payment failed (no wallet address)"
+
+            # Send notification with GIF tweet URL
+            logging.info(f"Sending SSE notification with GIF tweet URL: {tweet_url}")
+            notify_clients_of_payment_status(
+                tip.ln_payment_hash,  # Use original payment hash
+                status="gif_ready",  # New status for GIF
+                message=message,
+                tweet_url=tweet_url,
+            )
+    return None
+
+
+def record_forward(job_id: int, payment_hash: str) -> None:
+    """Save the hash of the invoice about to be paid, before any sats leave the node."""
+    with SessionLocal() as db:
+        db.query(PayoutJob).filter(PayoutJob.id == job_id).update(
+            {PayoutJob.forward_payment_hash: payment_hash}, synchronize_session=False
+        )
+        db.commit()
+
+
+def settle_earlier_forward(job_id: int, tip_id: int) -> None:
+    """
+    Ask the node about the payment an earlier run of the job started, e.g. before its worker died.
+    A completed payment marks the tip paid out and a pending one raises PayoutRetry; only a failed or unknown
+    payment lets the tip be forwarded again.
+    """
+    with SessionLocal() as db:
+        job = db.query(PayoutJob).filter(PayoutJob.id == job_id).first()
+        tip = db.query(Tip).filter(Tip.id == tip_id).first()
+        if not job or not job.forward_payment_hash or not tip or tip.paid_out:
+            return
+
+        payment_hash = job.forward_payment_hash
+        payment = get_payment(payment_hash)
+        status = payment.status if payment else None
+        if status == breez_sdk.PaymentStatus.PENDING:
+            raise PayoutRetry(f"Earlier payment {payment_hash} for tip #{tip_id} is still pending")
+
+        if status == breez_sdk.PaymentStatus.COMPLETE:
+            logging.warning(f"[payout] Tip #{tip_id} was already forwarded by an earlier run in {payment_hash}")
+            tip.forward_payment_hash = payment_hash
+            tip.paid_out = True
+        else:
+            logging.info(f"[payout] Earlier payment {payment_hash} for tip #{tip_id} did not go through")
+        job.forward_payment_hash = None
+        db.commit()
+
+
+def process_payout(job_id: int, tip_id: int) -> Optional[MediaProcessing]:
+    """
+    Post the GIF and forward the payment for a paid tip. Raises PayoutRetry if the sats were not forwarded.
+    Returns MediaProcessing if the job has to come back for the GIF once Twitter has processed it;
+    the payment does not wait for that.
+    """
+    processing = post_tip_gif(job_id, tip_id)
+    settle_earlier_forward(job_id, tip_id)
+    forward_payment_to_receiver(tip_id, before_paying=lambda payment_hash: record_forward(job_id, payment_hash))
+
+    with SessionLocal() as db:
+        tip = db.query(Tip).filter(Tip.id == tip_id).first()
+        if not tip:
+            return None
+
+        # Tips to recipients without a wallet are not retried; forward_pending_tips_for_user requeues them
+        receiver = tip.tweet.author if tip.tweet else None
+        if receiver and receiver.wallet_address and not tip.paid_out:
+            raise PayoutRetry(f"Tip #{tip_id} was not forwarded to {receiver.wallet_address}")
+
+    return processing
+
+
+def run_job(job_id: int, tip_id: int) -> None:
+    try:
+        processing = process_payout(job_id, tip_id)
+    except Exception as e:
+        finish_job(job_id, error=str(e) or e.__class__.__name__)
+    else:
+        if processing and wait_for_media(job_id, processing.check_after_secs):
+            return
+        finish_job(job_id)
+        logging.info(f"[payout] Job #{job_id} for tip #{tip_id} done")
+
+
+def recover_payout_jobs() -> None:
+    """
+    Run at startup. Create jobs for paid tips to wallet holders that never got one (e.g. paid before the queue
+    existed). Jobs interrupted mid-run are picked up again by claim_next_job once their lock times out.
+    """
+    with SessionLocal() as db:
+        stranded_tip_ids: List[int] = [
+            tip_id
+            for (tip_id,) in db.query(Tip.id)
+            .join(Tweet, Tweet.id == Tip.tweet_id)
+            .join(User, User.id == Tweet.tweet_author)
+            .outerjoin(PayoutJob, PayoutJob.tip_id == Tip.id)
+            .filter(
+                Tip.paid_in.is_(True),
+                Tip.paid_out.is_(False),
+                User.wallet_address.is_not(None),
+                PayoutJob.id.is_(None),
+            )
+            .all()
+        ]
+        for tip_id in stranded_tip_ids:
+            enqueue_payout(db, tip_id)
+
+        db.commit()
+
+    if stranded_tip_ids:
+        logging.info(f"[payout] Queued {len(stranded_tip_ids)} stranded tips")
+
+
+class PayoutWorkerPool:
+    """
+    Fixed-size pool of threads draining the payout_jobs table.
+    Workers poll every PAYOUT_POLL_INTERVAL_SECONDS and are woken early by wake() when a job is enqueued.
+    One more thread renews the locks of the running jobs, however long a payment takes.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._threads: List[threading.Thread] = []
+        self._stopping = threading.Event()
+        self._wakeup = threading.Condition()
+        self._running: Set[int] = set()
+        self._running_lock = threading.Lock()
+
+    def start(self) -> None:
+        if self._threads:
+            return
+        recover_payout_jobs()
+        self._stopping.clear()
+        for i in range(self.size):
+            thread = threading.Thread(target=self._run, name=f"payout-worker-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._renew_locks, name="payout-lock-renewal", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+        logging.info(f"[payout] Started {self.size} payout workers")
+
+    def stop(self) -> None:
+        self._stopping.set()
+        self.wake(all_workers=True)
+        for thread in self._threads:
+            thread.join(timeout=5)
+        self._threads = []
+
+    def wake(self, all_workers: bool = False) -> None:
+        with self._wakeup:
+            if all_workers:
+                self._wakeup.notify_all()
+            else:
+                self._wakeup.notify()
+
+    def _run(self) -> None:
+        while not self._stopping.is_set():
+            try:
+                claimed = claim_next_job()
+            except Exception as e:
+                logging.error(f"[payout] Failed to claim a job: {e}")
+                claimed = None
+
+            if claimed is None:
+                with self._wakeup:
+                    self._wakeup.wait(timeout=settings.PAYOUT_POLL_INTERVAL_SECONDS)
+                continue
+
+            job_id, _ = claimed
+            with self._running_lock:
+                self._running.add(job_id)
+            try:
+                run_job(*claimed)
+            finally:
+                with self._running_lock:
+                    self._running.discard(job_id)
+
+    def _renew_locks(self) -> None:
+        # Well within the timeout, so one slow or failed renewal doesn't let another worker reclaim the job
+        while not self._stopping.wait(settings.PAYOUT_JOB_LOCK_TIMEOUT_SECONDS / 3):
+            with self._running_lock:
+                job_ids = list(self._running)
+            if not job_ids:
+                continue
+            try:
+                renew_job_locks(job_ids)
+            except Exception as e:
+                logging.error(f"[payout] Failed to renew job locks: {e}")
+
+
+payout_workers = PayoutWorkerPool(settings.PAYOUT_WORKERS)
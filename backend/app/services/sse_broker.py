@@ -0,0 +1,155 @@
+import asyncio
+import json
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from itertools import count
+from typing import Callable, Optional
+
+from config import settings
+from db import async_engine, engine
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection
+
+# (payment_hash, event_id, serialized SSE update) -> None
+DeliverFn = Callable[[str, int, str], None]
+
+# The event id is drawn in the same statement that sends the notification
+NOTIFY_PAYMENT_EVENT = text(
+    "SELECT pg_notify(CAST(:channel AS text), json_build_object("
+    "'payment_hash', CAST(:payment_hash AS text), "
+    "'event_id', nextval('payment_event_seq'), "
+    "'update', CAST(:update AS text))::text)"
+)
+
+
+class PaymentEventBroker(ABC):
+    """
+    Fans payment status updates out to every process serving SSE.
+    publish() may be called from any thread; deliver is called for each update received by this process.
+    The broker assigns event ids, increasing in the order subscribers should see the updates.
+    """
+
+    def __init__(self, deliver: DeliverFn):
+        self.deliver = deliver
+
+    @abstractmethod
+    def publish(self, payment_hash: str, update: str) -> None: ...
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        pass
+
+
+class InMemoryBroker(PaymentEventBroker):
+    """Single-process broker: updates only reach clients connected to this worker."""
+
+    def __init__(self, deliver: DeliverFn):
+        super().__init__(deliver)
+        # Starts at the boot time so ids keep increasing past the Last-Event-ID a client kept across a restart
+        self._event_ids = count(time.time_ns())
+        self._lock = threading.Lock()
+
+    def publish(self, payment_hash: str, update: str) -> None:
+        # Ids are handed out and delivered in one step, so a later id can't overtake an earlier one
+        with self._lock:
+            self.deliver(payment_hash, next(self._event_ids), update)
+
+
+class PostgresBroker(PaymentEventBroker):
+    """
+    Uses Postgres LISTEN/NOTIFY on SSE_BROKER_CHANNEL, so any worker or replica sharing the database
+    receives every update, including the ones it published itself. Event ids come from payment_event_seq,
+    so they are ordered the same way on every replica.
+    """
+
+    def __init__(self, deliver: DeliverFn, channel: str):
+        super().__init__(deliver)
+        self.channel = channel
+        self._listen_task: Optional[asyncio.Task] = None
+        # One thread keeps NOTIFYs in publish order and the caller (possibly the event loop) off the DB round trip.
+        # Lives from start() to stop(), so the broker can be started again after a stop.
+        self._notify_executor: Optional[ThreadPoolExecutor] = None
+
+    def publish(self, payment_hash: str, update: str) -> None:
+        executor = self._notify_executor
+        if executor is None:
+            # Not started (or already stopped): no loop to keep free, send it from the caller's thread
+            self._notify(payment_hash, update)
+            return
+        executor.submit(self._notify, payment_hash, update)
+
+    def _notify(self, payment_hash: str, update: str) -> None:
+        try:
+            with engine.begin() as conn:
+                conn.execute(
+                    NOTIFY_PAYMENT_EVENT, {"channel": self.channel, "payment_hash": payment_hash, "update": update}
+                )
+        except Exception as e:
+            logging.error(f"[sse_broker] Failed to publish payment status for {payment_hash}: {e}")
+
+    async def start(self) -> None:
+        if self._notify_executor is None:
+            self._notify_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sse-notify")
+        if self._listen_task is None:
+            self._listen_task = asyncio.create_task(self._listen())
+
+    async def stop(self) -> None:
+        if self._listen_task:
+            self._listen_task.cancel()
+            try:
+                await self._listen_task
+            except asyncio.CancelledError:
+                pass
+            self._listen_task = None
+        executor, self._notify_executor = self._notify_executor, None
+        if executor is not None:
+            # Let queued NOTIFYs go out without blocking the loop
+            await asyncio.get_running_loop().run_in_executor(None, executor.shutdown)
+
+    def _on_notification(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            message = json.loads(payload)
+            self.deliver(message["payment_hash"], message["event_id"], message["update"])
+        except Exception as e:
+            logging.error(f"[sse_broker] Invalid notification on {channel}: {e}")
+
+    async def _listen(self) -> None:
+        # Hold one dedicated connection for LISTEN; reconnect if the server drops it
+        while True:
+            conn: Optional[AsyncConnection] = None
+            try:
+                conn = await async_engine.connect()
+                raw = await conn.get_raw_connection()
+                driver_connection = raw.driver_connection
+
+                terminated = asyncio.Event()
+                driver_connection.add_termination_listener(lambda _: terminated.set())
+                await driver_connection.add_listener(self.channel, self._on_notification)
+                logging.info(f"[sse_broker] Listening on Postgres channel {self.channel}")
+
+                await terminated.wait()
+                logging.warning("[sse_broker] LISTEN connection closed, reconnecting")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"[sse_broker] LISTEN failed: {e}")
+                await asyncio.sleep(5)
+            finally:
+                if conn is not None:
+                    try:
+                        await conn.invalidate()
+                    except Exception:
+                        pass
+
+
+def create_broker(deliver: DeliverFn) -> PaymentEventBroker:
+    if settings.SSE_BROKER == "postgres":
+        return PostgresBroker(deliver, settings.SSE_BROKER_CHANNEL)
+    if settings.SSE_BROKER != "memory":
+        raise ValueError(f"Unknown SSE_BROKER {settings.SSE_BROKER!r}, expected 'memory' or 'postgres'")
+    return InMemoryBroker(deliver)
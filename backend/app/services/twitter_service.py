@@ -1,18 +1,34 @@
+import hashlib
 import json
 import logging
+import threading
+import time
 import uuid
 from datetime import datetime, timedelta, timezone
 from io import BytesIO
-from typing import Dict, List, Optional
+from typing import Dict, List, NamedTuple, Optional
 
-import requests
 import tweepy
 from config import settings
+from db import SessionLocal, dialect_insert
 from fastapi import HTTPException
+from fastapi.concurrency import run_in_threadpool
 from models.db import Tip, User
 from requests_oauthlib import OAuth1
-from sqlalchemy import func
+from services.gif_cache import (
+    GifCacheWriter,
+    get_gif_media,
+    get_reusable_media_id,
+    gif_disk_cache,
+    mark_gif_media_ready,
+    record_lookup,
+    remember_gif_media,
+)
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from utils.cache import TTLCache
+from utils.http_client import http_session
 
 
 async def verify_twitter_credentials():
@@ -56,105 +72,341 @@ write_client = tweepy.Client(
     access_token_secret=settings.TWITTER_ACCESS_TOKEN_SECRET,
 )
 
+# Share the pooled keep-alive session instead of one session per client; auth is passed per request
+read_client.session = http_session
+write_client.session = http_session
 
 
-def post_gif_to_twitter(db: Session, tip: Tip) -> Optional[str]:
-    """Post a GIF to Twitter using the GIF bot account and return with url /photo/1"""
-    if not tip.tweet or not tip.gif_url:
-        logging.warning(f"Tweet {tip.tweet_id} or GIF URL not found. Skipping GIF post.")
-        return None
+class BotAccount(NamedTuple):
+    id: str
+    username: str
 
-    try:
-        # Download the GIF
-        logging.info(f"Attempting to download GIF from {tip.gif_url}")
-        headers = {
-            "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36"
-        }
-        response = requests.get(tip.gif_url, headers=headers, timeout=10)
 
-        if response.status_code != 200:
-            logging.error(f"Failed to download GIF from {tip.gif_url}")
-            return None
+_bot_account: Optional[BotAccount] = None
+_bot_account_fingerprint: Optional[str] = None
+# A failed lookup isn't retried for these credentials until the monotonic _bot_account_retry_at
+_bot_account_failed_fingerprint: Optional[str] = None
+_bot_account_retry_at = 0.0
+_bot_account_lookup_running = False
+_bot_account_lock = threading.Lock()
 
-        content_type = response.headers.get("Content-Type", "image/gif")
-        media_content = response.content
-        media_size = len(media_content)
-        logging.info(f"Downloaded {media_size} bytes of {content_type}")
 
-        # Create OAuth1 auth object
-        oauth = OAuth1(
+def credentials_fingerprint() -> str:
+    """Identifies the posting account's OAuth 1.0a credentials without keeping them around in another form."""
+    credentials = "\0".join(
+        value or ""
+        for value in (
             settings.TWITTER_CONSUMER_KEY,
-            client_secret=settings.TWITTER_CONSUMER_SECRET,
-            resource_owner_key=settings.TWITTER_ACCESS_TOKEN,
-            resource_owner_secret=settings.TWITTER_ACCESS_TOKEN_SECRET,
+            settings.TWITTER_CONSUMER_SECRET,
+            settings.TWITTER_ACCESS_TOKEN,
+            settings.TWITTER_ACCESS_TOKEN_SECRET,
         )
+    )
+    return hashlib.sha256(credentials.encode()).hexdigest()
+
+
+def get_bot_account() -> Optional[BotAccount]:
+    """
+    The account GIF tweets are posted from, looked up with users/me once and cached until the credentials change.
+    Returns None while the lookup is failing (retried after TWITTER_BOT_ACCOUNT_RETRY_SECONDS) or running in
+    another thread; callers never wait on the network for it.
+    """
+    global _bot_account, _bot_account_fingerprint, _bot_account_failed_fingerprint
+    global _bot_account_retry_at, _bot_account_lookup_running
+    fingerprint = credentials_fingerprint()
+    with _bot_account_lock:
+        if _bot_account is not None and _bot_account_fingerprint == fingerprint:
+            return _bot_account
+        if _bot_account_lookup_running:
+            return None
+        if _bot_account_failed_fingerprint == fingerprint and time.monotonic() < _bot_account_retry_at:
+            return None
+        _bot_account_lookup_running = True
 
-        # INIT phase
-        init_url = "https://upload.twitter.com/1.1/media/upload.json"
-        init_data = {
-            "command": "INIT",
-            "total_bytes": media_size,
-            "media_type": content_type,
-            "media_category": "tweet_gif",
-        }
+    account = None
+    try:
+        response = write_client.get_me(user_auth=True)
+        if response and response.data:
+            account = BotAccount(id=str(response.data.id), username=response.data.username)
+        else:
+            logging.error("Failed to look up the bot account: empty users/me response")
+    except Exception as e:
+        logging.error(f"Failed to look up the bot account: {e}")
+    finally:
+        with _bot_account_lock:
+            _bot_account_lookup_running = False
+            if account is not None:
+                _bot_account = account
+                _bot_account_fingerprint = fingerprint
+            else:
+                _bot_account_failed_fingerprint = fingerprint
+                _bot_account_retry_at = time.monotonic() + settings.TWITTER_BOT_ACCOUNT_RETRY_SECONDS
+
+    if account is not None:
+        logging.info(f"Posting GIF tweets as @{account.username} ({account.id})")
+    return account
+
+
+def bot_tweet_url(tweet_id: str) -> str:
+    """URL of a GIF tweet posted by the bot, opening on the GIF"""
+    account = get_bot_account()
+    # twitter.com/i/status/<id> resolves to the tweet whoever posted it
+    username = account.username if account else "i"
+    return f"https://twitter.com/{username}/status/{tweet_id}/photo/1"
+
+
+MEDIA_UPLOAD_URL = "https://upload.twitter.com/1.1/media/upload.json"
+
+
+def read_chunk(source, view: memoryview) -> int:
+    """Fill view from a binary stream; returns the bytes read, less than len(view) only at EOF."""
+    filled = 0
+    while filled < len(view):
+        n = source.readinto(view[filled:])
+        if not n:
+            break
+        filled += n
+    return filled
+
+
+def upload_media_stream(
+    source, media_size: int, content_type: str, oauth: OAuth1, sink: Optional[GifCacheWriter] = None
+) -> Optional[dict]:
+    """
+    Chunked media upload (INIT/APPEND/FINALIZE) of media_size bytes read from source; returns the FINALIZE response.
+    The body is read straight into one reusable GIF_UPLOAD_CHUNK_BYTES buffer and each segment is sent as a
+    memoryview of it, so memory per upload stays at one chunk. Every segment is also handed to sink, if given.
+    """
+    # INIT phase
+    init_data = {
+        "command": "INIT",
+        "total_bytes": media_size,
+        "media_type": content_type,
+        "media_category": "tweet_gif",
+    }
+
+    logging.info("INIT phase...")
+    init_response = http_session.post(MEDIA_UPLOAD_URL, data=init_data, auth=oauth)
+
+    if init_response.status_code != 202:
+        logging.error(f"INIT failed with status {init_response.status_code}: {init_response.text}")
+        return None
 
-        logging.info("INIT phase...")
-        init_response = requests.post(init_url, data=init_data, auth=oauth)
+    media_id = init_response.json()["media_id_string"]
+    logging.info(f"Media ID: {media_id}")
 
-        if init_response.status_code != 202:
-            logging.error(f"INIT failed with status {init_response.status_code}: {init_response.text}")
+    # APPEND phase, one segment per chunk as it arrives
+    chunk = memoryview(bytearray(min(settings.GIF_UPLOAD_CHUNK_BYTES, max(media_size, 1))))
+    segment_index = 0
+    bytes_sent = 0
+
+    while bytes_sent < media_size:
+        size = read_chunk(source, chunk[: media_size - bytes_sent])
+        if not size:
+            logging.error(f"GIF source ended after {bytes_sent}/{media_size} bytes")
             return None
+        if sink is not None:
+            sink.write(chunk[:size])
 
-        media_id = init_response.json()["media_id_string"]
-        logging.info(f"Media ID: {media_id}")
+        logging.info(f"APPEND phase, segment {segment_index}, size {size} bytes...")
+        append_data = {"command": "APPEND", "media_id": media_id, "segment_index": segment_index}
+        files = {"media": chunk[:size]}
 
-        # APPEND phase
-        media_io = BytesIO(media_content)
-        chunk_size = 4 * 1024 * 1024  # 4MB chunks
+        append_response = http_session.post(MEDIA_UPLOAD_URL, data=append_data, files=files, auth=oauth)
 
-        segment_index = 0
-        bytes_sent = 0
+        if append_response.status_code != 204:
+            logging.error(f"APPEND failed with status {append_response.status_code}: {append_response.text}")
+            return None
 
-        while bytes_sent < media_size:
-            chunk = media_io.read(chunk_size)
-            if not chunk:
-                break
+        segment_index += 1
+        bytes_sent += size
+        logging.info(f"Progress: {bytes_sent}/{media_size} bytes ({bytes_sent / media_size * 100:.1f}%)")
 
-            logging.info(f"APPEND phase, segment {segment_index}, size {len(chunk)} bytes...")
+    # FINALIZE phase
+    finalize_data = {"command": "FINALIZE", "media_id": media_id}
 
-            append_url = "https://upload.twitter.com/1.1/media/upload.json"
-            append_data = {"command": "APPEND", "media_id": media_id, "segment_index": segment_index}
+    logging.info("FINALIZE phase...")
+    finalize_response = http_session.post(MEDIA_UPLOAD_URL, data=finalize_data, auth=oauth)
 
-            files = {"media": chunk}
+    if finalize_response.status_code not in (200, 201):
+        logging.error(f"FINALIZE failed with status {finalize_response.status_code}: {finalize_response.text}")
+        return None
 
-            append_response = requests.post(append_url, data=append_data, files=files, auth=oauth)
+    finalize_json = finalize_response.json()
+    logging.info(f"Upload complete! Response: {json.dumps(finalize_json, indent=2)}")
+
+    # Check processing state
+    if "processing_info" in finalize_json:
+        processing_info = finalize_json["processing_info"]
+        logging.info(f"Media processing state: {processing_info.get('state')}")
+
+    return finalize_json
+
+
+class MediaProcessing(Exception):
+    """Twitter is still processing uploaded media; its STATUS should be checked again after check_after_secs."""
+
+    def __init__(self, media_id: str, check_after_secs: int):
+        super().__init__(f"Media {media_id} is still processing, check again in {check_after_secs}s")
+        self.media_id = media_id
+        self.check_after_secs = check_after_secs
 
-            if append_response.status_code != 204:
-                logging.error(f"APPEND failed with status {append_response.status_code}: {append_response.text}")
-                return None
 
-            segment_index += 1
-            bytes_sent += len(chunk)
-            logging.info(f"Progress: {bytes_sent}/{media_size} bytes ({bytes_sent / media_size * 100:.1f}%)")
+def media_ready(media_id: str, response_json: dict) -> bool:
+    """
+    Read the processing_info of a FINALIZE or STATUS response: True once the media can be tweeted, False if
+    processing failed. Raises MediaProcessing while Twitter is still working on it.
+    """
+    processing_info = response_json.get("processing_info")
+    if not processing_info:
+        return True
 
-        # FINALIZE phase
-        finalize_url = "https://upload.twitter.com/1.1/media/upload.json"
-        finalize_data = {"command": "FINALIZE", "media_id": media_id}
+    state = processing_info.get("state")
+    if state in ("pending", "in_progress"):
+        raise MediaProcessing(media_id, processing_info.get("check_after_secs", 1))
+    if state != "succeeded":
+        logging.error(f"Processing of media {media_id} failed: {processing_info.get('error')}")
+        return False
+    return True
 
-        logging.info("FINALIZE phase...")
-        finalize_response = requests.post(finalize_url, data=finalize_data, auth=oauth)
 
-        if finalize_response.status_code not in (200, 201):
-            logging.error(f"FINALIZE failed with status {finalize_response.status_code}: {finalize_response.text}")
+def check_media_status(media_id: str, oauth: OAuth1) -> bool:
+    """STATUS poll for media that was still processing after FINALIZE; same contract as media_ready()."""
+    response = http_session.get(MEDIA_UPLOAD_URL, params={"command": "STATUS", "media_id": media_id}, auth=oauth)
+    if response.status_code != 200:
+        logging.error(f"STATUS failed with status {response.status_code}: {response.text}")
+        return False
+
+    status_json = response.json()
+    logging.info(f"Media {media_id} processing state: {status_json.get('processing_info', {}).get('state')}")
+    if not media_ready(media_id, status_json):
+        return False
+
+    expires_after_secs = status_json.get("expires_after_secs", settings.GIF_MEDIA_DEFAULT_EXPIRY_SECONDS)
+    try:
+        mark_gif_media_ready(media_id, expires_after_secs)
+    except Exception as e:
+        logging.warning(f"Failed to record media_id {media_id} as ready: {e}")
+    return True
+
+
+def upload_gif_media(gif_url: str, oauth: OAuth1) -> Optional[str]:
+    """
+    Upload the GIF at gif_url and return its media_id, reusing earlier work where possible:
+    an unexpired media_id from a previous upload of the same content (under this or any other URL whose bytes
+    hash the same) is returned as is, and a GIF already in the local content-addressed cache is uploaded from
+    disk. If those lookups fail the GIF is uploaded afresh. Otherwise the download is streamed into the upload and
+    teed into the cache. GIFs over GIF_MAX_BYTES are rejected from the Content-Length before anything is
+    downloaded; sources that send no Content-Length are buffered up to the limit.
+    Raises MediaProcessing if Twitter is still processing the upload (see check_media_status()).
+    """
+    try:
+        gif = get_gif_media(gif_url)
+        media_id = get_reusable_media_id(gif.content_sha256) if gif is not None else None
+    except Exception as e:
+        logging.warning(f"Failed to look up earlier uploads of {gif_url}, uploading it again: {e}")
+        gif, media_id = None, None
+
+    if media_id:
+        record_lookup("media")
+        logging.info(f"Reusing media_id {media_id} for {gif_url}")
+        return media_id
+
+    if gif is not None:
+        cached = gif_disk_cache.open(gif.content_sha256)
+        if cached is not None:
+            record_lookup("disk")
+            logging.info(f"Uploading {gif_url} from the GIF cache ({gif.size_bytes} bytes)")
+            with cached:
+                finalize_json = upload_media_stream(cached, gif.size_bytes, gif.content_type, oauth)
+            if finalize_json is None:
+                return None
+            return remember_upload(gif_url, gif.content_sha256, gif.content_type, gif.size_bytes, finalize_json)
+
+    record_lookup("miss")
+    logging.info(f"Attempting to download GIF from {gif_url}")
+    headers = {
+        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.124 Safari/537.36",
+        # The raw stream is read directly, so ask for the bytes as stored
+        "Accept-Encoding": "identity",
+    }
+    with http_session.get(gif_url, headers=headers, timeout=10, stream=True) as response:
+        if response.status_code != 200:
+            logging.error(f"Failed to download GIF from {gif_url}")
             return None
 
-        finalize_json = finalize_response.json()
-        logging.info(f"Upload complete! Response: {json.dumps(finalize_json, indent=2)}")
+        content_type = response.headers.get("Content-Type", "image/gif")
+        content_length = response.headers.get("Content-Length", "")
+        if content_length.isdigit():
+            source = response.raw
+            media_size = int(content_length)
+        else:
+            # INIT needs total_bytes up front, so a body without Content-Length is buffered (up to the limit)
+            source = BytesIO(response.raw.read(settings.GIF_MAX_BYTES + 1))
+            media_size = len(source.getbuffer())
+        if media_size > settings.GIF_MAX_BYTES:
+            logging.error(f"GIF at {gif_url} is {media_size} bytes, over the {settings.GIF_MAX_BYTES} byte limit")
+            return None
+        logging.info(f"Streaming {media_size} bytes of {content_type}")
+
+        sink = gif_disk_cache.writer()
+        try:
+            finalize_json = upload_media_stream(source, media_size, content_type, oauth, sink=sink)
+        except Exception:
+            sink.discard()
+            raise
+        if finalize_json is None:
+            sink.discard()
+            return None
+        content_sha256 = sink.commit()
+
+    return remember_upload(gif_url, content_sha256, content_type, media_size, finalize_json)
+
 
-        # Check processing state
-        if "processing_info" in finalize_json:
-            processing_info = finalize_json["processing_info"]
-            logging.info(f"Media processing state: {processing_info.get('state')}")
+def remember_upload(
+    gif_url: str, content_sha256: str, content_type: str, size_bytes: int, finalize_json: dict
+) -> Optional[str]:
+    media_id = finalize_json["media_id_string"]
+    processing_info = finalize_json.get("processing_info") or {}
+    if processing_info.get("state", "succeeded") == "succeeded":
+        expires_after_secs = finalize_json.get("expires_after_secs", settings.GIF_MEDIA_DEFAULT_EXPIRY_SECONDS)
+    else:
+        expires_after_secs = None  # not reusable until check_media_status() sees it succeed
+    try:
+        remember_gif_media(gif_url, content_sha256, content_type, size_bytes, media_id, expires_after_secs)
+    except Exception as e:
+        logging.warning(f"Failed to record media_id {media_id} for {gif_url}: {e}")
+
+    if not media_ready(media_id, finalize_json):
+        return None
+    return media_id
+
+
+def post_gif_to_twitter(db: Session, tip: Tip, processing_media_id: Optional[str] = None) -> Optional[str]:
+    """
+    Post a GIF to Twitter using the GIF bot account and return with url /photo/1
+    Raises MediaProcessing if the uploaded GIF isn't ready yet; call again with its media_id as
+    processing_media_id after check_after_secs to poll STATUS instead of uploading again.
+    """
+    if not tip.tweet or not tip.gif_url:
+        logging.warning(f"Tweet {tip.tweet_id} or GIF URL not found. Skipping GIF post.")
+        return None
+
+    try:
+        # Create OAuth1 auth object
+        oauth = OAuth1(
+            settings.TWITTER_CONSUMER_KEY,
+            client_secret=settings.TWITTER_CONSUMER_SECRET,
+            resource_owner_key=settings.TWITTER_ACCESS_TOKEN,
+            resource_owner_secret=settings.TWITTER_ACCESS_TOKEN_SECRET,
+        )
+
+        if processing_media_id:
+            media_id = processing_media_id if check_media_status(processing_media_id, oauth) else None
+        else:
+            media_id = upload_gif_media(tip.gif_url, oauth)
+        if media_id is None:
+            return None
 
         # Create tweet text with sender, recipient, but without the URL
         sender_username = f"@{tip.sender.twitter_username}" if tip.sender else "Anonymous"
@@ -172,7 +424,7 @@ def post_gif_to_twitter(db: Session, tip: Tip) -> Optional[str]:
 
         headers = {"Content-Type": "application/json"}
 
-        response = requests.post(url, json=payload, auth=oauth, headers=headers)
+        response = http_session.post(url, json=payload, auth=oauth, headers=headers)
 
         if response.status_code not in (200, 201):
             logging.error(f"Tweet creation failed with status {response.status_code}: {response.text}")
@@ -187,20 +439,14 @@ def post_gif_to_twitter(db: Session, tip: Tip) -> Optional[str]:
         tip.reply_tweet_id = tweet_id
         db.commit()
 
-        # Get username for URL construction
-        try:
-            user_info_response = requests.get("https://api.twitter.com/2/users/me", auth=oauth)
-            username = user_info_response.json()["data"]["username"]
-        except:
-            # Fallback to a default
-            username = "ZapZapBot"
-
         # Generate the tweet URL with /photo/1
-        tweet_url = f"https://twitter.com/{username}/status/{tweet_id}/photo/1"
+        tweet_url = bot_tweet_url(tweet_id)
         logging.info(f"Posted GIF to Twitter for Tip #{tip.id}. Tweet URL: {tweet_url}")
 
         return tweet_url
 
+    except MediaProcessing:
+        raise
     except Exception as e:
         logging.error(f"Error posting GIF to Twitter: {str(e)}")
         import traceback
@@ -230,68 +476,60 @@ def add_rate_limit_tracking(response) -> None:
         logging.debug(f"Rate limit tracking error: {str(e)}")
 
 
+def update_avatar_batch(db: Session, batch: List[str], request_id: str) -> None:
+    """Fetch up to 100 users from Twitter and upsert their avatars. Raises tweepy errors to the caller."""
+    response = read_client.get_users(usernames=batch, user_fields=["profile_image_url_bigger"])
+
+    # Log full response details
+    logging.info(f"[{request_id}] Twitter API Response: {response}")
+    if response.data:
+        for user in response.data:
+            # Rename _normal to _bigger in the profile_image_url
+            if user.profile_image_url:
+                new_url = user.profile_image_url.replace("_normal", "_bigger")
+                user.profile_image_url = new_url
+
+            logging.info(
+                f"[{request_id}] User data received: username={user.username}, avatar_url={user.profile_image_url}"
+            )
+
+    # Log rate limit details from headers
+    if hasattr(response, "response") and response.response:
+        headers = response.response.headers
+        logging.info(f"[{request_id}] Rate Limit Headers: {dict(headers)}")
+
+    if not response.data:
+        logging.warning(f"[{request_id}] No user data returned for batch: {batch}")
+        return
+
+    # One upsert per batch: usernames are stored lowercase, so the unique column is the conflict target
+    now = datetime.now(timezone.utc)
+    rows = {
+        user_data.username.lower(): {
+            "twitter_username": user_data.username.lower(),
+            "avatar_url": user_data.profile_image_url,
+            "avatar_updated_at": now,
+        }
+        for user_data in response.data
+    }
+    insert = dialect_insert(db)
+    stmt = insert(User).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.twitter_username],
+        set_={"avatar_url": stmt.excluded.avatar_url, "avatar_updated_at": stmt.excluded.avatar_updated_at},
+    )
+    db.execute(stmt)
+    db.commit()
+    logging.info(f"[{request_id}] Upserted avatars for {len(rows)} users")
+
+
 def update_user_avatars(db: Session, usernames: List[str]) -> None:
     request_id = str(uuid.uuid4())
     logging.info(f"[{request_id}] Starting avatar update for usernames: {usernames}")
 
     try:
         for i in range(0, len(usernames), 100):
-            batch = usernames[i : i + 100]
-            response = read_client.get_users(usernames=batch, user_fields=["profile_image_url_bigger"])
-
-            # Log full response details
-            logging.info(f"[{request_id}] Twitter API Response: {response}")
-            if response.data:
-                for user in response.data:
-                    # Rename _normal to _bigger in the profile_image_url
-                    if user.profile_image_url:
-                        new_url = user.profile_image_url.replace("_normal", "_bigger")
-                        user.profile_image_url = new_url
-
-                    logging.info(
-                        f"[{request_id}] User data received: username={user.username}, "
-                        f"avatar_url={user.profile_image_url}"
-                    )
-
-            # Log rate limit details from headers
-            if hasattr(response, "response") and response.response:
-                headers = response.response.headers
-                logging.info(f"[{request_id}] Rate Limit Headers: {dict(headers)}")
-
-            if not response.data:
-                logging.warning(f"[{request_id}] No user data returned for batch: {batch}")
-                continue
-
-            for user_data in response.data:
-                try:
-                    existing_user = (
-                        db.query(User).filter(func.lower(User.twitter_username) == user_data.username.lower()).first()
-                    )
-
-                    # Log what we're doing with each user
-                    if existing_user:
-                        logging.info(f"[{request_id}] Updating existing user {user_data.username}")
-                        logging.info(f"[{request_id}] Old avatar: {existing_user.avatar_url}")
-                        logging.info(f"[{request_id}] New avatar: {user_data.profile_image_url}")
-                        existing_user.avatar_url = user_data.profile_image_url
-                        existing_user.avatar_updated_at = datetime.now(timezone.utc)
-                    else:
-                        logging.info(f"[{request_id}] Creating new user {user_data.username}")
-                        db.add(
-                            User(
-                                twitter_username=user_data.username.lower(),
-                                avatar_url=user_data.profile_image_url,
-                                avatar_updated_at=datetime.now(timezone.utc),
-                            )
-                        )
-
-                except Exception as e:
-                    logging.error(f"[{request_id}] Error processing user {user_data.username}: {str(e)}")
-                    logging.error(f"[{request_id}] Full user data: {user_data}")
-                    db.rollback()
-                    continue
-
-            db.commit()
+            update_avatar_batch(db, usernames[i : i + 100], request_id)
 
     except tweepy.TooManyRequests as e:
         headers = e.response.headers
@@ -303,6 +541,119 @@ def update_user_avatars(db: Session, usernames: List[str]) -> None:
         db.rollback()
 
 
+class AvatarRefresher:
+    """
+    Background worker for stale-while-revalidate avatars.
+    Request handlers enqueue stale usernames and return the cached avatar immediately; this thread deduplicates
+    them, waits a moment so a burst fills one batch, and refreshes them in 100-name get_users calls spaced out
+    to stay within the users lookup rate limit.
+    """
+
+    batch_size = 100
+    batch_window_seconds = 1.0
+
+    def __init__(self):
+        self._pending: Dict[str, None] = {}  # insertion-ordered set
+        self._in_flight: set = set()
+        self._recently_attempted = TTLCache(settings.TWITTER_AVATAR_REFRESH_RETRY_SECONDS)
+        self._condition = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = False
+        self._next_call_at = 0.0
+
+    def start(self) -> None:
+        with self._condition:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopping = False
+            self._thread = threading.Thread(target=self._run, name="avatar-refresher", daemon=True)
+            self._thread.start()
+        logging.info("Avatar refresher started")
+
+    def stop(self) -> None:
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+        if self._thread:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def enqueue(self, usernames: List[str]) -> None:
+        with self._condition:
+            added = False
+            for username in usernames:
+                username = username.lower()
+                if username in self._pending or username in self._in_flight:
+                    continue
+                if self._recently_attempted.get(username):
+                    continue  # e.g. suspended accounts Twitter doesn't return; retry later
+                self._pending[username] = None
+                added = True
+            if added:
+                self._condition.notify()
+
+    def _next_batch(self) -> Optional[List[str]]:
+        with self._condition:
+            while not self._pending and not self._stopping:
+                self._condition.wait()
+            if self._stopping:
+                return None
+
+            # Coalesce a burst of requests, then respect the spacing between Twitter calls
+            deadline = time.monotonic() + self.batch_window_seconds
+            while len(self._pending) < self.batch_size and not self._stopping:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(timeout=remaining)
+            delay = self._next_call_at - time.monotonic()
+            while delay > 0 and not self._stopping:
+                self._condition.wait(timeout=delay)
+                delay = self._next_call_at - time.monotonic()
+            if self._stopping:
+                return None
+
+            batch = list(self._pending)[: self.batch_size]
+            for username in batch:
+                del self._pending[username]
+                self._in_flight.add(username)
+            return batch
+
+    def _run(self) -> None:
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                return
+
+            request_id = str(uuid.uuid4())
+            self._next_call_at = time.monotonic() + settings.TWITTER_AVATAR_REFRESH_MIN_INTERVAL_SECONDS
+            try:
+                with SessionLocal() as db:
+                    update_avatar_batch(db, batch, request_id)
+                for username in batch:
+                    self._recently_attempted.set(username, True)
+            except tweepy.TooManyRequests as e:
+                reset_timestamp = int(e.response.headers.get("x-rate-limit-reset", "0"))
+                self._next_call_at = time.monotonic() + max(reset_timestamp - time.time(), 60)
+                logging.warning(f"[{request_id}] Avatar refresh rate limited; retrying {len(batch)} users later")
+                # Straight back into _pending: enqueue() would skip them while they are still in flight
+                with self._condition:
+                    self._in_flight.difference_update(batch)
+                    for username in batch:
+                        self._pending.setdefault(username, None)
+                    self._condition.notify()
+            except Exception as e:
+                logging.error(f"[{request_id}] Avatar refresh failed: {e}")
+                for username in batch:
+                    self._recently_attempted.set(username, True)
+            finally:
+                with self._condition:
+                    self._in_flight.difference_update(batch)
+
+
+avatar_refresher = AvatarRefresher()
+
+
 def post_tweet(tweet_id: str, text: str):
     try:
         response = write_client.create_tweet(text=text, in_reply_to_tweet_id=tweet_id)
@@ -317,66 +668,76 @@ def post_tweet(tweet_id: str, text: str):
 
 def get_avatars_for_usernames(usernames: List[str], db: Session) -> Dict[str, str]:
     request_id = str(uuid.uuid4())
+    if not usernames:
+        return {}
 
     try:
-        existing_users = (
-            db.query(User).filter(func.lower(User.twitter_username).in_([u.lower() for u in usernames])).all()
-        )
+        query = db.query(User).filter(func.lower(User.twitter_username).in_({u.lower() for u in usernames}))
+        users = query.all()
+        users_by_name = {u.twitter_username.lower(): u for u in users}
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.TWITTER_AVATAR_CACHE_TTL_DAYS)
+        stale = (u.lower() for u in usernames if _avatar_is_stale(users_by_name.get(u.lower()), cutoff))
+        to_update = list(dict.fromkeys(stale))
+
+        if to_update and settings.TWITTER_AVATAR_REFRESH_IN_BACKGROUND:
+            logging.info(f"[{request_id}] Queueing avatar refresh for {len(to_update)} users")
+            avatar_refresher.enqueue(to_update)
+        elif to_update:
+            try:
+                logging.info(f"[{request_id}] Updating avatars for {len(to_update)} users")
+                update_user_avatars(db, to_update)
+                # Refresh the query in a new transaction
+                db.rollback()  # Clear any pending transaction
+                users = query.populate_existing().all()
+            except Exception as e:
+                logging.error(f"[{request_id}] Error during avatar update: {str(e)}")
 
-        try:
-            cache_ttl_days = int(settings.TWITTER_AVATAR_CACHE_TTL_DAYS)
-        except (ValueError, TypeError):
-            logging.warning(
-                f"[{request_id}] Invalid TWITTER_AVATAR_CACHE_TTL_DAYS value, using default: {cache_ttl_days}"
-            )
+        return {u.twitter_username: u.avatar_url or "" for u in users}
 
-        cutoff = datetime.now(timezone.utc) - timedelta(days=cache_ttl_days)
+    except Exception as e:
+        logging.error(f"[{request_id}] Error: {str(e)}")
+        return {username: "" for username in usernames}
 
-        existing_users = (
-            db.query(User).filter(func.lower(User.twitter_username).in_([u.lower() for u in usernames])).all()
-        )
 
-        to_update = set()
-        for username in usernames:
-            try:
-                user = next((u for u in existing_users if u.twitter_username.lower() == username.lower()), None)
-                if not user:
-                    to_update.add(username)
-                    continue
+def _avatar_is_stale(user: Optional[User], cutoff: datetime) -> bool:
+    if not user or not user.avatar_updated_at:
+        return True
+    updated_at = user.avatar_updated_at
+    if updated_at.tzinfo is None:
+        updated_at = updated_at.replace(tzinfo=timezone.utc)
+    return updated_at < cutoff
 
-                if not user.avatar_updated_at:
-                    to_update.add(username)
-                    continue
 
-                # Ensure avatar_updated_at is timezone aware
-                try:
-                    updated_at = user.avatar_updated_at
-                    if updated_at.tzinfo is None:
-                        updated_at = updated_at.replace(tzinfo=timezone.utc)
-                    if updated_at < cutoff:
-                        to_update.add(username)
-                except (AttributeError, TypeError) as e:
-                    logging.error(f"[{request_id}] Error processing timestamp for user {username}: {str(e)}")
-                    to_update.add(username)  # Update on error to be safe
+def _refresh_avatars(usernames: List[str]) -> None:
+    with SessionLocal() as db:
+        update_user_avatars(db, usernames)
 
-            except Exception as e:
-                logging.error(f"[{request_id}] Error processing user {username}: {str(e)}")
-                continue
 
-        if to_update:
-            try:
-                logging.info(f"[{request_id}] Updating avatars for {len(to_update)} users")
-                update_user_avatars(db, list(to_update))
-                # Refresh the query in a new transaction
-                db.rollback()  # Clear any pending transaction
-                existing_users = (
-                    db.query(User).filter(func.lower(User.twitter_username).in_([u.lower() for u in usernames])).all()
-                )
-            except Exception as e:
-                logging.error(f"[{request_id}] Error during avatar update: {str(e)}")
+async def aget_avatars_for_usernames(usernames: List[str], db: AsyncSession) -> Dict[str, str]:
+    """Async variant of get_avatars_for_usernames; the blocking Twitter refresh runs in the threadpool."""
+    request_id = str(uuid.uuid4())
+    if not usernames:
+        return {}
 
-        result = {u.twitter_username: u.avatar_url or "" for u in existing_users}
-        return result
+    try:
+        stmt = select(User).where(func.lower(User.twitter_username).in_({u.lower() for u in usernames}))
+        users = (await db.execute(stmt)).scalars().all()
+        users_by_name = {u.twitter_username.lower(): u for u in users}
+
+        cutoff = datetime.now(timezone.utc) - timedelta(days=settings.TWITTER_AVATAR_CACHE_TTL_DAYS)
+        stale = (u.lower() for u in usernames if _avatar_is_stale(users_by_name.get(u.lower()), cutoff))
+        to_update = list(dict.fromkeys(stale))
+
+        if to_update and settings.TWITTER_AVATAR_REFRESH_IN_BACKGROUND:
+            logging.info(f"[{request_id}] Queueing avatar refresh for {len(to_update)} users")
+            avatar_refresher.enqueue(to_update)
+        elif to_update:
+            logging.info(f"[{request_id}] Updating avatars for {len(to_update)} users")
+            await run_in_threadpool(_refresh_avatars, to_update)
+            users = (await db.execute(stmt.execution_options(populate_existing=True))).scalars().all()
+
+        return {u.twitter_username: u.avatar_url or "" for u in users}
 
     except Exception as e:
         logging.error(f"[{request_id}] Error: {str(e)}")
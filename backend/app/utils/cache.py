@@ -0,0 +1,109 @@
+import asyncio
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+_MISSING = object()
+
+
+def _retrieve_exception(task: asyncio.Task) -> None:
+    # Every caller may have been cancelled before the factory failed; don't log "exception was never retrieved"
+    if not task.cancelled():
+        task.exception()
+
+
+class TTLCache:
+    """
+    Thread-safe in-process cache with a per-entry time to live.
+    get_or_set() lets only one caller per key run the factory (single-flight); the others wait for its result.
+    Values computed while an invalidate() happened are returned to their caller but not stored.
+    """
+
+    def __init__(self, ttl_seconds: float):
+        self.ttl_seconds = ttl_seconds
+        self._entries: Dict[Hashable, Tuple[float, Any]] = {}
+        self._key_locks: Dict[Hashable, threading.Lock] = {}
+        self._pending: Dict[Hashable, asyncio.Task] = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    def _lookup(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return _MISSING
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            self._entries.pop(key, None)
+            return _MISSING
+        return value
+
+    def get(self, key: Hashable, default: Any = None) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+        return default if value is _MISSING else value
+
+    def set(self, key: Hashable, value: Any, ttl_seconds: Optional[float] = None) -> None:
+        ttl = self.ttl_seconds if ttl_seconds is None else ttl_seconds
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+
+    def get_or_set(self, key: Hashable, factory: Callable[[], Any]) -> Any:
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                return value
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+
+        with key_lock:
+            with self._lock:
+                value = self._lookup(key)
+                generation = self._generation
+            if value is not _MISSING:
+                return value
+
+            try:
+                value = factory()
+                with self._lock:
+                    if generation == self._generation:
+                        self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+                return value
+            finally:
+                with self._lock:
+                    self._key_locks.pop(key, None)
+
+    async def get_or_set_async(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Async counterpart of get_or_set(): concurrent callers await the one in-flight factory call.
+        The factory runs in its own task, so a cancelled caller stops waiting without cancelling the others.
+        """
+        with self._lock:
+            value = self._lookup(key)
+            if value is not _MISSING:
+                return value
+            pending = self._pending.get(key)
+            if pending is None:
+                pending = asyncio.ensure_future(self._fill(key, factory, self._generation))
+                pending.add_done_callback(_retrieve_exception)
+                self._pending[key] = pending
+
+        return await asyncio.shield(pending)
+
+    async def _fill(self, key: Hashable, factory: Callable[[], Awaitable[Any]], generation: int) -> Any:
+        try:
+            value = await factory()
+            with self._lock:
+                if generation == self._generation:
+                    self._entries[key] = (time.monotonic() + self.ttl_seconds, value)
+            return value
+        finally:
+            with self._lock:
+                self._pending.pop(key, None)
+
+    def invalidate(self, key: Optional[Hashable] = None) -> None:
+        """Drop one key, or every entry when no key is given."""
+        with self._lock:
+            self._generation += 1
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
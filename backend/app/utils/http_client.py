@@ -0,0 +1,78 @@
+from typing import Optional
+
+import httpx
+import requests
+from config import settings
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+
+class TimeoutHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter that applies a default (connect, read) timeout to requests that don't set one."""
+
+    def __init__(self, *args, timeout=None, **kwargs):
+        self.timeout = timeout
+        super().__init__(*args, **kwargs)
+
+    def send(self, request, **kwargs):
+        if kwargs.get("timeout") is None:
+            kwargs["timeout"] = self.timeout
+        return super().send(request, **kwargs)
+
+
+def build_http_session() -> requests.Session:
+    """
+    Keep-alive session for blocking callers (Twitter uploads, tweepy, LNURL lookups).
+    Connections are pooled per host; only idempotent requests are retried, uploads and tweets are not.
+    """
+    retry = Retry(
+        total=settings.HTTP_RETRIES,
+        backoff_factor=0.5,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=frozenset({"GET", "HEAD"}),
+        respect_retry_after_header=True,
+        raise_on_status=False,
+    )
+    adapter = TimeoutHTTPAdapter(
+        timeout=(settings.HTTP_CONNECT_TIMEOUT_SECONDS, settings.HTTP_READ_TIMEOUT_SECONDS),
+        pool_connections=settings.HTTP_POOL_HOSTS,
+        pool_maxsize=settings.HTTP_POOL_MAXSIZE,
+        max_retries=retry,
+    )
+    session = requests.Session()
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+
+http_session = build_http_session()
+
+_async_http_client: Optional[httpx.AsyncClient] = None
+
+
+def get_async_http_client() -> httpx.AsyncClient:
+    """
+    Shared HTTP/2 client for async callers, created on first use.
+    Transport retries only cover failed connection attempts, so they are safe for POSTs.
+    """
+    global _async_http_client
+    if _async_http_client is None or _async_http_client.is_closed:
+        _async_http_client = httpx.AsyncClient(
+            timeout=httpx.Timeout(settings.HTTP_READ_TIMEOUT_SECONDS, connect=settings.HTTP_CONNECT_TIMEOUT_SECONDS),
+            transport=httpx.AsyncHTTPTransport(
+                http2=True,
+                retries=settings.HTTP_RETRIES,
+                limits=httpx.Limits(
+                    max_connections=settings.HTTP_POOL_MAXSIZE * settings.HTTP_POOL_HOSTS,
+                    max_keepalive_connections=settings.HTTP_POOL_MAXSIZE,
+                ),
+            ),
+        )
+    return _async_http_client
+
+
+async def close_async_http_client() -> None:
+    global _async_http_client
+    if _async_http_client is not None:
+        await _async_http_client.aclose()
+        _async_http_client = None
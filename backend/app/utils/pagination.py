@@ -0,0 +1,41 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional, Sequence, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import Select, and_, or_
+
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    raw = json.dumps([created_at.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+def paginate_newest_first(stmt: Select, created_at_col, id_col, cursor: Optional[str], limit: int) -> Select:
+    """
+    Apply keyset pagination ordered by (created_at, id) descending.
+    One extra row is fetched so next_page() can tell whether another page exists.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        stmt = stmt.where(or_(created_at_col < created_at, and_(created_at_col == created_at, id_col < row_id)))
+    return stmt.order_by(created_at_col.desc(), id_col.desc()).limit(limit + 1)
+
+
+def next_page(rows: Sequence, limit: int) -> Tuple[Sequence, Optional[str]]:
+    """Split the limit + 1 rows fetched by paginate_newest_first() into (page, next_cursor)."""
+    if len(rows) <= limit:
+        return rows, None
+    page = rows[:limit]
+    last = page[-1]
+    return page, encode_cursor(last.created_at, last.id)
@@ -2,7 +2,7 @@ from datetime import datetime, timedelta, timezone
 from typing import Optional
 
 from config import settings
-from db import get_db
+from db import get_async_db
 from fastapi import (
     Depends,
     HTTPException,
@@ -14,7 +14,8 @@ from jose import (
     jwt,
 )
 from models.db import User
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
 oath2_scheme = OAuth2PasswordBearer(tokenUrl="/auth/twitter/login")
 
@@ -50,9 +51,10 @@ def decode_jwt_token(token: str) -> TokenData:
         raise credentials_exception
 
 
-def get_current_user(token: str = Depends(oath2_scheme), db: Session = Depends(get_db)) -> User:
+async def get_current_user(token: str = Depends(oath2_scheme), db: AsyncSession = Depends(get_async_db)) -> User:
     token_data = decode_jwt_token(token)
-    user = db.query(User).filter(User.twitter_username == token_data.user_twitter_username).first()
+    result = await db.execute(select(User).where(User.twitter_username == token_data.user_twitter_username))
+    user = result.scalars().first()
     if user is None:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found.")
     return user
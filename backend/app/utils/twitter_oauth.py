@@ -1,7 +1,7 @@
 from urllib.parse import urlencode
 
-import httpx
 from config import settings
+from utils.http_client import get_async_http_client
 
 AUTHORIZE_URL = "https://twitter.com/i/oauth2/authorize"
 TOKEN_URL = "https://api.twitter.com/2/oauth2/token"
@@ -34,18 +34,18 @@ async def exchange_code_for_token(code: str):
         "client_id": settings.TWITTER_OAUTH2_CLIENT_ID,
         "code_verifier": "challenge",
     }
-    async with httpx.AsyncClient() as client:
-        r = await client.post(
-            TOKEN_URL, data=data, auth=(settings.TWITTER_OAUTH2_CLIENT_ID, settings.TWITTER_OAUTH2_CLIENT_SECRET)
-        )
-        r.raise_for_status()
-        return r.json()
+    client = get_async_http_client()
+    r = await client.post(
+        TOKEN_URL, data=data, auth=(settings.TWITTER_OAUTH2_CLIENT_ID, settings.TWITTER_OAUTH2_CLIENT_SECRET)
+    )
+    r.raise_for_status()
+    return r.json()
 
 
 async def get_twitter_user_info(access_token: str):
     headers = {"Authorization": f"Bearer {access_token}"}
     params = {"user.fields": "id,username"}
-    async with httpx.AsyncClient() as client:
-        r = await client.get(USERINFO_URL, headers=headers, params=params)
-        r.raise_for_status()
-        return r.json()
+    client = get_async_http_client()
+    r = await client.get(USERINFO_URL, headers=headers, params=params)
+    r.raise_for_status()
+    return r.json()
@@ -1,31 +1,55 @@
 # filepath: /backend/tests/conftest.py
+import os
+import tempfile
+
+# Before the app is imported: keep its own engine off the developer's database, and don't start the Breez
+# connection, Twitter lookups or worker threads from TestClient's startup
+os.environ["LOCAL_DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/app.sqlite3"
+os.environ["RUN_BACKGROUND_SERVICES"] = "false"
+
 import pytest
-from app.db import Base, get_db
-from app.main import app  # Your FastAPI app
+from db import Base, get_async_db, get_db
 from fastapi.testclient import TestClient
+from main import app  # Your FastAPI app
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker
-from sqlalchemy.pool import StaticPool
+from sqlalchemy.pool import NullPool
+
+
+@pytest.fixture(scope="session")
+def database_path(tmp_path_factory):
+    # File-backed SQLite so the sync and async engines see the same database
+    return tmp_path_factory.mktemp("db") / "test.sqlite3"
 
 
 @pytest.fixture(scope="session")
-def engine():
-    # Use in-memory SQLite for testing
+def engine(database_path):
     engine = create_engine(
-        "sqlite:///:memory:",
+        f"sqlite:///{database_path}",
         connect_args={"check_same_thread": False},
-        poolclass=StaticPool,
     )
     Base.metadata.drop_all(bind=engine)
     Base.metadata.create_all(bind=engine)
     return engine
 
 
+@pytest.fixture(scope="session")
+def async_engine(engine, database_path):
+    # NullPool: each TestClient runs its own event loop, so connections can't be reused across tests
+    return create_async_engine(f"sqlite+aiosqlite:///{database_path}", poolclass=NullPool)
+
+
 @pytest.fixture(scope="session")
 def TestingSessionLocal(engine):
     return sessionmaker(bind=engine, autocommit=False, autoflush=False)
 
 
+@pytest.fixture(scope="session")
+def TestingAsyncSessionLocal(async_engine):
+    return async_sessionmaker(bind=async_engine, autoflush=False, expire_on_commit=False)
+
+
 @pytest.fixture
 def db_session(TestingSessionLocal):
     session = TestingSessionLocal()
@@ -36,14 +60,19 @@ def db_session(TestingSessionLocal):
 
 
 @pytest.fixture
-def client(db_session):
+def client(db_session, TestingAsyncSessionLocal):
     def override_get_db():
         try:
             yield db_session
         finally:
             db_session.close()
 
+    async def override_get_async_db():
+        async with TestingAsyncSessionLocal() as session:
+            yield session
+
     app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_async_db] = override_get_async_db
     with TestClient(app) as c:
         yield c
     app.dependency_overrides.clear()  # cleanup after test
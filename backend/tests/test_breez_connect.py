@@ -0,0 +1,30 @@
+import asyncio
+
+from config import settings
+from services import lightning_service
+from services.lightning_service import breez_health, connect_breez_with_retry
+
+
+def test_connect_keeps_retrying_when_the_config_is_rejected(monkeypatch):
+    monkeypatch.setattr(settings, "BREEZ_CONNECT_RETRY_BASE_SECONDS", 0.01)
+    monkeypatch.setattr(settings, "BREEZ_CONNECT_RETRY_MAX_SECONDS", 0.01)
+    monkeypatch.setattr(breez_health, "attempts", 0)
+    monkeypatch.setattr(breez_health, "last_error", None)
+
+    def invalid_mnemonic(mnemonic):
+        raise ValueError("invalid mnemonic")
+
+    monkeypatch.setattr(lightning_service, "mnemonic_to_seed", invalid_mnemonic)
+
+    async def main():
+        task = asyncio.create_task(connect_breez_with_retry())
+        while breez_health.attempts < 3 and not task.done():
+            await asyncio.sleep(0.01)
+        still_retrying = not task.done()
+        task.cancel()
+        return still_retrying
+
+    assert asyncio.run(main())
+    assert breez_health.last_error == "invalid mnemonic"
+    assert not breez_health.connected
+    assert not breez_health.connecting
@@ -0,0 +1,62 @@
+import asyncio
+
+import pytest
+from utils.cache import TTLCache
+
+
+def test_get_or_set_async_runs_factory_once():
+    cache = TTLCache(ttl_seconds=60)
+    calls = []
+
+    async def factory():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "board"
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_set_async("key", factory) for _ in range(5)))
+
+    assert asyncio.run(main()) == ["board"] * 5
+    assert len(calls) == 1
+    assert cache.get("key") == "board"
+
+
+def test_cancelled_first_caller_does_not_cancel_waiters():
+    cache = TTLCache(ttl_seconds=60)
+
+    async def main():
+        factory_started = asyncio.Event()
+
+        async def factory():
+            factory_started.set()
+            await asyncio.sleep(0.01)
+            return "board"
+
+        first = asyncio.create_task(cache.get_or_set_async("key", factory))
+        await factory_started.wait()
+        waiter = asyncio.create_task(cache.get_or_set_async("key", factory))
+        await asyncio.sleep(0)
+        first.cancel()
+
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        return await waiter
+
+    assert asyncio.run(main()) == "board"
+    assert cache.get("key") == "board"
+
+
+def test_get_or_set_async_failure_reaches_every_caller_and_is_not_cached():
+    cache = TTLCache(ttl_seconds=60)
+
+    async def factory():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("db down")
+
+    async def main():
+        return await asyncio.gather(*(cache.get_or_set_async("key", factory) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(main())
+
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert cache.get("key") is None
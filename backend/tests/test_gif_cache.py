@@ -0,0 +1,170 @@
+import hashlib
+import os
+import time
+from datetime import timedelta
+from io import BytesIO
+from types import SimpleNamespace
+
+import pytest
+from models.db import GifMedia, utcnow
+from services import gif_cache, twitter_service
+from services.gif_cache import STALE_PARTIAL_SECONDS, GifDiskCache
+
+
+def cache_gif(cache: GifDiskCache, data: bytes) -> str:
+    writer = cache.writer()
+    writer.write(memoryview(data))
+    return writer.commit()
+
+
+def test_commit_files_gif_under_its_sha256(tmp_path):
+    cache = GifDiskCache(str(tmp_path), max_bytes=1000)
+
+    digest = cache_gif(cache, b"gif89a")
+
+    assert digest == hashlib.sha256(b"gif89a").hexdigest()
+    with cache.open(digest) as cached:
+        assert cached.read() == b"gif89a"
+    assert cache.stats() == {"files": 1, "bytes": 6, "evictions": 0}
+    assert [name for name in os.listdir(tmp_path)] == [digest]
+
+
+def test_evicts_least_recently_used_past_max_bytes(tmp_path):
+    cache = GifDiskCache(str(tmp_path), max_bytes=250)
+    first = cache_gif(cache, b"a" * 100)
+    second = cache_gif(cache, b"b" * 100)
+    cache.open(first).close()  # first is now the most recently used
+
+    third = cache_gif(cache, b"c" * 100)
+
+    assert cache.open(second) is None
+    assert cache.open(first) is not None
+    assert cache.open(third) is not None
+    assert cache.stats() == {"files": 2, "bytes": 200, "evictions": 1}
+    assert sorted(os.listdir(tmp_path)) == sorted([first, third])
+
+
+def test_same_content_is_counted_once(tmp_path):
+    cache = GifDiskCache(str(tmp_path), max_bytes=1000)
+
+    cache_gif(cache, b"same")
+    cache_gif(cache, b"same")
+
+    assert cache.stats()["files"] == 1
+    assert cache.stats()["bytes"] == 4
+
+
+def test_index_is_rebuilt_from_directory(tmp_path):
+    digest = cache_gif(GifDiskCache(str(tmp_path), max_bytes=1000), b"persisted")
+
+    cache = GifDiskCache(str(tmp_path), max_bytes=1000)
+
+    assert cache.open(digest) is not None
+    assert cache.stats()["bytes"] == len(b"persisted")
+
+
+def test_only_stale_partial_files_are_removed(tmp_path):
+    fresh = tmp_path / "fresh.part"
+    stale = tmp_path / "stale.part"
+    fresh.write_bytes(b"in progress elsewhere")
+    stale.write_bytes(b"abandoned")
+    old = time.time() - STALE_PARTIAL_SECONDS - 60
+    os.utime(stale, (old, old))
+
+    GifDiskCache(str(tmp_path), max_bytes=1000).stats()
+    GifDiskCache(str(tmp_path), max_bytes=1000).open("0" * 64)
+
+    assert fresh.exists()
+    assert not stale.exists()
+
+
+def test_unusable_directory_still_hashes(tmp_path):
+    not_a_directory = tmp_path / "file"
+    not_a_directory.write_bytes(b"")
+    cache = GifDiskCache(str(not_a_directory), max_bytes=1000)
+
+    digest = cache_gif(cache, b"gif89a")
+
+    assert digest == hashlib.sha256(b"gif89a").hexdigest()
+    assert cache.open(digest) is None
+
+
+def test_commit_survives_temp_file_removed_by_another_process(tmp_path):
+    cache = GifDiskCache(str(tmp_path), max_bytes=1000)
+    writer = cache.writer()
+    writer.write(memoryview(b"gif89a"))
+    for name in os.listdir(tmp_path):
+        os.remove(tmp_path / name)
+
+    assert writer.commit() == hashlib.sha256(b"gif89a").hexdigest()
+    assert cache.stats()["files"] == 0
+
+
+class FakeDownload:
+    def __init__(self, data: bytes):
+        self.status_code = 200
+        self.headers = {"Content-Type": "image/gif", "Content-Length": str(len(data))}
+        self.raw = BytesIO(data)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+@pytest.fixture
+def uploads(TestingSessionLocal, tmp_path, monkeypatch):
+    """Content uploaded by upload_gif_media; the download serves the bytes in `uploads.source`."""
+    monkeypatch.setattr(gif_cache, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(twitter_service, "gif_disk_cache", GifDiskCache(str(tmp_path), max_bytes=1000))
+    uploads = SimpleNamespace(source=b"gif89a", uploaded=[])
+
+    def get(url, **kwargs):
+        return FakeDownload(uploads.source)
+
+    def upload_media_stream(source, media_size, content_type, oauth, sink=None):
+        data = source.read(media_size)
+        if sink is not None:
+            sink.write(memoryview(data))
+        uploads.uploaded.append(data)
+        return {"media_id_string": f"uploaded-{len(uploads.uploaded)}"}
+
+    monkeypatch.setattr(twitter_service.http_session, "get", get)
+    monkeypatch.setattr(twitter_service, "upload_media_stream", upload_media_stream)
+    return uploads
+
+
+def add_gif_media(session_factory, gif_url: str, data: bytes, media_id: str, expires_in: timedelta):
+    with session_factory() as db:
+        db.add(
+            GifMedia(
+                gif_url=gif_url,
+                content_sha256=hashlib.sha256(data).hexdigest(),
+                content_type="image/gif",
+                size_bytes=len(data),
+                media_id=media_id,
+                media_expires_at=utcnow() + expires_in,
+            )
+        )
+        db.commit()
+
+
+def test_media_id_is_reused_for_the_same_content_under_another_url(uploads, TestingSessionLocal):
+    data = b"gif89a-shared-content"
+    add_gif_media(TestingSessionLocal, "https://a.example/shared.gif", data, "shared-media", timedelta(hours=12))
+    add_gif_media(TestingSessionLocal, "https://b.example/shared.gif", data, "expired-media", timedelta(hours=-1))
+
+    assert twitter_service.upload_gif_media("https://b.example/shared.gif", oauth=None) == "shared-media"
+    assert uploads.uploaded == []
+
+
+def test_failed_media_lookup_falls_back_to_a_fresh_upload(uploads, monkeypatch):
+    def get_gif_media(gif_url):
+        raise RuntimeError("database unavailable")
+
+    monkeypatch.setattr(twitter_service, "get_gif_media", get_gif_media)
+    uploads.source = b"gif89a-lookup-failure"
+
+    assert twitter_service.upload_gif_media("https://c.example/fresh.gif", oauth=None) == "uploaded-1"
+    assert uploads.uploaded == [b"gif89a-lookup-failure"]
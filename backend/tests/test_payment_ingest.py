@@ -0,0 +1,93 @@
+from datetime import datetime, timezone
+
+import pytest
+from models.db import PayoutJob, Tip, Tweet, User, UserTipStats
+from services import payment_ingest
+from services.payment_ingest import ingest_paid_invoices, mark_tips_paid
+from sqlalchemy import func
+
+
+@pytest.fixture
+def notifications(TestingSessionLocal, monkeypatch):
+    sent = []
+    monkeypatch.setattr(payment_ingest, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(
+        payment_ingest, "notify_clients_of_payment_status", lambda payment_hash, **kwargs: sent.append(payment_hash)
+    )
+    return sent
+
+
+def add_unpaid_tips(db_session, name: str, count: int):
+    tweet_id = (db_session.query(func.max(Tweet.id)).scalar() or 0) + 1
+    sender = User(twitter_username=f"{name}_sender")
+    recipient = User(twitter_username=f"{name}_recipient")
+    db_session.add_all([sender, recipient])
+    db_session.flush()
+    db_session.add(Tweet(id=tweet_id, tweet_author=recipient.id))
+    db_session.flush()
+    tips = [
+        Tip(
+            tip_sender=sender.id,
+            tweet_id=tweet_id,
+            ln_payment_hash=f"{name}-{i}",
+            amount_sats=100,
+            created_at=datetime.now(timezone.utc),
+        )
+        for i in range(count)
+    ]
+    db_session.add_all(tips)
+    db_session.commit()
+    return sender, recipient, tips
+
+
+def sent_stats(db_session, user: User):
+    db_session.expire_all()
+    return (
+        db_session.query(func.sum(UserTipStats.sent_sats), func.sum(UserTipStats.sent_count))
+        .filter(UserTipStats.user_id == user.id)
+        .one()
+    )
+
+
+def payout_jobs(db_session, tips):
+    return db_session.query(PayoutJob).filter(PayoutJob.tip_id.in_([tip.id for tip in tips])).count()
+
+
+def test_duplicate_hashes_in_a_batch_count_once(db_session, notifications):
+    sender, _, tips = add_unpaid_tips(db_session, "ingest_dupes", 2)
+    hashes = [tip.ln_payment_hash for tip in tips]
+
+    newly_paid = mark_tips_paid(hashes + hashes)
+
+    assert sorted(newly_paid) == sorted(hashes)
+    assert sent_stats(db_session, sender) == (200, 2)
+    assert payout_jobs(db_session, tips) == 2
+
+
+def test_replayed_batch_is_a_no_op(db_session, notifications):
+    sender, _, tips = add_unpaid_tips(db_session, "ingest_replay", 2)
+    hashes = [tip.ln_payment_hash for tip in tips]
+    mark_tips_paid(hashes)
+
+    assert mark_tips_paid(hashes) == []
+    assert sent_stats(db_session, sender) == (200, 2)
+    assert payout_jobs(db_session, tips) == 2
+
+
+def test_partially_replayed_batch_only_pays_new_tips(db_session, notifications):
+    sender, _, tips = add_unpaid_tips(db_session, "ingest_partial", 3)
+    mark_tips_paid([tips[0].ln_payment_hash])
+
+    newly_paid = mark_tips_paid([tip.ln_payment_hash for tip in tips])
+
+    assert sorted(newly_paid) == sorted(tip.ln_payment_hash for tip in tips[1:])
+    assert sent_stats(db_session, sender) == (300, 3)
+
+
+def test_notifies_paid_tips_but_not_unknown_hashes(db_session, notifications):
+    _, _, tips = add_unpaid_tips(db_session, "ingest_notify", 2)
+    mark_tips_paid([tips[0].ln_payment_hash])
+
+    ingest_paid_invoices([tips[0].ln_payment_hash, tips[1].ln_payment_hash, "not-a-tip"])
+
+    assert notifications == [tips[0].ln_payment_hash, tips[1].ln_payment_hash]
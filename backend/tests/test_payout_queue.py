@@ -0,0 +1,210 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import breez_sdk
+import pytest
+from config import settings
+from models.db import PayoutJob, Tip, Tweet, User
+from services import lightning_service, payout_service
+from services.payout_service import (
+    JOB_DONE,
+    JOB_FAILED,
+    JOB_PENDING,
+    JOB_RUNNING,
+    PayoutRetry,
+    claim_next_job,
+    finish_job,
+    process_payout,
+    renew_job_locks,
+)
+from sqlalchemy import func
+
+
+@pytest.fixture(autouse=True)
+def payout_db(TestingSessionLocal, db_session, monkeypatch):
+    monkeypatch.setattr(payout_service, "SessionLocal", TestingSessionLocal)
+    monkeypatch.setattr(lightning_service, "SessionLocal", TestingSessionLocal)
+    # Jobs from other tests must not be claimed here
+    db_session.query(PayoutJob).delete()
+    db_session.commit()
+
+
+def add_job(db_session, **job_fields) -> PayoutJob:
+    tweet_id = (db_session.query(func.max(Tweet.id)).scalar() or 0) + 1
+    recipient = User(twitter_username=f"payout_recipient_{tweet_id}")
+    db_session.add(recipient)
+    db_session.flush()
+    db_session.add(Tweet(id=tweet_id, tweet_author=recipient.id))
+    tip = Tip(tweet_id=tweet_id, ln_payment_hash=f"payout-{tweet_id}", amount_sats=21, paid_in=True)
+    db_session.add(tip)
+    db_session.flush()
+    job = PayoutJob(tip_id=tip.id, **job_fields)
+    db_session.add(job)
+    db_session.commit()
+    return job
+
+
+def add_forwarding_job(db_session, forward_payment_hash: str) -> PayoutJob:
+    job = add_job(db_session, status=JOB_RUNNING, attempts=1, forward_payment_hash=forward_payment_hash)
+    sender = User(twitter_username=f"payout_sender_{job.tip_id}")
+    db_session.add(sender)
+    db_session.flush()
+    job.tip.tip_sender = sender.id
+    job.tip.tweet.author.wallet_address = "recipient@wallet.example"
+    db_session.commit()
+    return job
+
+
+@pytest.fixture
+def node_payments(monkeypatch):
+    """payment hash -> status of the payments the fake node knows about"""
+    payments = {}
+
+    def get_payment(payment_hash):
+        status = payments.get(payment_hash)
+        return SimpleNamespace(status=status) if status is not None else None
+
+    monkeypatch.setattr(payout_service, "get_payment", get_payment)
+    monkeypatch.setattr(payout_service, "post_tip_gif", lambda job_id, tip_id: None)
+    return payments
+
+
+def get_job(db_session, job_id: int) -> PayoutJob:
+    db_session.expire_all()
+    return db_session.get(PayoutJob, job_id)
+
+
+def test_claim_marks_job_running_once(db_session):
+    job = add_job(db_session, status=JOB_PENDING)
+
+    assert claim_next_job() == (job.id, job.tip_id)
+    assert claim_next_job() is None
+
+    claimed = get_job(db_session, job.id)
+    assert claimed.status == JOB_RUNNING
+    assert claimed.attempts == 1
+    assert claimed.locked_at is not None
+
+
+def test_claim_skips_jobs_not_yet_due(db_session):
+    add_job(db_session, status=JOB_PENDING, next_attempt_at=datetime.now(timezone.utc) + timedelta(minutes=5))
+
+    assert claim_next_job() is None
+
+
+def test_claim_reclaims_running_job_with_stale_lock(db_session):
+    now = datetime.now(timezone.utc)
+    stale = add_job(
+        db_session,
+        status=JOB_RUNNING,
+        attempts=1,
+        locked_at=now - timedelta(seconds=settings.PAYOUT_JOB_LOCK_TIMEOUT_SECONDS + 60),
+    )
+    add_job(db_session, status=JOB_RUNNING, attempts=1, locked_at=now)
+
+    assert claim_next_job() == (stale.id, stale.tip_id)
+    assert claim_next_job() is None
+    assert get_job(db_session, stale.id).attempts == 2
+
+
+def test_finish_job_success(db_session):
+    job = add_job(db_session, status=JOB_PENDING)
+    claim_next_job()
+
+    finish_job(job.id)
+
+    finished = get_job(db_session, job.id)
+    assert finished.status == JOB_DONE
+    assert finished.locked_at is None
+    assert finished.last_error is None
+
+
+def test_finish_job_error_schedules_retry(db_session):
+    job = add_job(db_session, status=JOB_PENDING)
+    claim_next_job()
+
+    finish_job(job.id, error="node offline")
+
+    retried = get_job(db_session, job.id)
+    assert retried.status == JOB_PENDING
+    assert retried.last_error == "node offline"
+    assert retried.locked_at is None
+    next_attempt_at = retried.next_attempt_at.replace(tzinfo=timezone.utc)
+    assert next_attempt_at > datetime.now(timezone.utc)
+    assert claim_next_job() is None
+
+
+def test_finish_job_error_fails_after_max_attempts(db_session):
+    job = add_job(db_session, status=JOB_PENDING, attempts=settings.PAYOUT_MAX_ATTEMPTS - 1)
+    claim_next_job()
+
+    finish_job(job.id, error="still offline")
+
+    failed = get_job(db_session, job.id)
+    assert failed.status == JOB_FAILED
+    assert failed.last_error == "still offline"
+
+
+def test_retry_delay_is_capped():
+    assert payout_service.retry_delay(1) == timedelta(seconds=settings.PAYOUT_RETRY_BASE_SECONDS)
+    assert payout_service.retry_delay(100) == timedelta(seconds=settings.PAYOUT_RETRY_MAX_SECONDS)
+
+
+def test_renewed_lock_is_not_reclaimed(db_session):
+    job = add_job(
+        db_session,
+        status=JOB_RUNNING,
+        attempts=1,
+        locked_at=datetime.now(timezone.utc) - timedelta(seconds=settings.PAYOUT_JOB_LOCK_TIMEOUT_SECONDS + 60),
+    )
+
+    renew_job_locks([job.id])
+
+    assert claim_next_job() is None
+    assert get_job(db_session, job.id).attempts == 1
+
+
+def test_completed_earlier_payment_is_not_sent_again(db_session, node_payments):
+    job = add_forwarding_job(db_session, "earlier-payment")
+    node_payments["earlier-payment"] = breez_sdk.PaymentStatus.COMPLETE
+
+    process_payout(job.id, job.tip_id)
+
+    db_session.expire_all()
+    tip = db_session.get(Tip, job.tip_id)
+    assert tip.paid_out
+    assert tip.forward_payment_hash == "earlier-payment"
+    assert get_job(db_session, job.id).forward_payment_hash is None
+
+
+def test_pending_earlier_payment_waits(db_session, node_payments, monkeypatch):
+    job = add_forwarding_job(db_session, "stuck-payment")
+    node_payments["stuck-payment"] = breez_sdk.PaymentStatus.PENDING
+    forwarded = []
+    monkeypatch.setattr(
+        payout_service, "forward_payment_to_receiver", lambda tip_id, **kwargs: forwarded.append(tip_id)
+    )
+
+    with pytest.raises(PayoutRetry):
+        process_payout(job.id, job.tip_id)
+
+    assert forwarded == []
+    assert get_job(db_session, job.id).forward_payment_hash == "stuck-payment"
+
+
+@pytest.mark.parametrize("status", [breez_sdk.PaymentStatus.FAILED, None])
+def test_failed_or_unknown_earlier_payment_is_sent_again(db_session, node_payments, monkeypatch, status):
+    job = add_forwarding_job(db_session, "lost-payment")
+    node_payments["lost-payment"] = status
+
+    def forward_payment_to_receiver(tip_id, before_paying):
+        before_paying("new-payment")
+        raise RuntimeError("node went away mid-payment")
+
+    monkeypatch.setattr(payout_service, "forward_payment_to_receiver", forward_payment_to_receiver)
+
+    with pytest.raises(RuntimeError):
+        process_payout(job.id, job.tip_id)
+
+    # Recorded before paying, so the next run asks the node about it instead of paying blind
+    assert get_job(db_session, job.id).forward_payment_hash == "new-payment"
@@ -0,0 +1,100 @@
+import asyncio
+
+import pytest
+from config import settings
+from routes import sse
+from services.sse_broker import PostgresBroker
+from starlette.requests import Request
+
+
+def sse_request(receive) -> Request:
+    return Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/sse/subscribe",
+            "query_string": b"",
+            "headers": [],
+        },
+        receive,
+    )
+
+
+@pytest.fixture(autouse=True)
+def fresh_connections(monkeypatch):
+    monkeypatch.setattr(sse, "connections", {})
+    monkeypatch.setattr(sse, "expiry_heap", [])
+    monkeypatch.setattr(sse, "_stale_expiry_entries", 0)
+    monkeypatch.setattr(settings, "SSE_HEARTBEAT_SECONDS", 30)
+
+
+def test_stream_ends_on_disconnect_before_heartbeat():
+    async def main():
+        client_gone = asyncio.Event()
+
+        async def receive():
+            await client_gone.wait()
+            return {"type": "http.disconnect"}
+
+        response = await sse.subscribe_to_payment(sse_request(receive), "disconnect_hash")
+        stream = response.body_iterator
+        await stream.__anext__()  # "connected"
+        assert "disconnect_hash" in sse.connections
+
+        client_gone.set()
+        # Nothing is sent to the dead client, so only the disconnect watcher can end the stream
+        with pytest.raises(StopAsyncIteration):
+            await asyncio.wait_for(stream.__anext__(), timeout=1)
+
+    asyncio.run(main())
+    assert sse.connections == {}
+
+
+def test_closed_streams_release_queues_and_compact_expiry_heap(monkeypatch):
+    monkeypatch.setattr(sse, "EXPIRY_HEAP_COMPACT_MIN", 4)
+
+    async def receive():
+        await asyncio.Event().wait()
+
+    async def main():
+        streams = []
+        for i in range(10):
+            response = await sse.subscribe_to_payment(sse_request(receive), f"hash_{i}")
+            await response.body_iterator.__anext__()
+            streams.append(response.body_iterator)
+        heap_entries = list(sse.expiry_heap)
+
+        for stream in streams:
+            await stream.aclose()
+        return heap_entries
+
+    heap_entries = asyncio.run(main())
+
+    assert all(connection.queue is None for *_, connection in heap_entries)
+    # Compacted when the 6th closed stream outnumbered the 4 live ones; the last 4 are left until popped
+    assert len(sse.expiry_heap) == 4
+    assert sse.expire_due_connections(float("inf")) == 0
+    assert sse.expiry_heap == []
+    assert sse._stale_expiry_entries == 0
+
+
+def test_postgres_broker_can_be_restarted(monkeypatch):
+    notified = []
+
+    async def listen(self):
+        await asyncio.Event().wait()
+
+    monkeypatch.setattr(PostgresBroker, "_listen", listen)
+    monkeypatch.setattr(PostgresBroker, "_notify", lambda self, payment_hash, update: notified.append(payment_hash))
+    broker = PostgresBroker(lambda *event: None, "payment_events")
+
+    async def main():
+        for payment_hash in ("first_run", "second_run"):
+            await broker.start()
+            broker.publish(payment_hash, "{}")
+            await broker.stop()  # waits for the queued NOTIFY
+
+    asyncio.run(main())
+    broker.publish("stopped", "{}")
+
+    assert notified == ["first_run", "second_run", "stopped"]
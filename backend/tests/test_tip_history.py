@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+
+import pytest
+from models.db import Tip, Tweet, User
+from sqlalchemy import event, func
+
+
+@pytest.fixture
+def count_queries(engine, async_engine):
+    statements = []
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    engines = [engine, async_engine.sync_engine]
+    for e in engines:
+        event.listen(e, "before_cursor_execute", before_cursor_execute)
+    yield statements
+    for e in engines:
+        event.remove(e, "before_cursor_execute", before_cursor_execute)
+
+
+def add_paid_tips(db_session, sender_name: str, recipient_name: str, count: int):
+    now = datetime.now(timezone.utc)
+    first_tweet_id = (db_session.query(func.max(Tweet.id)).scalar() or 0) + 1
+    sender = User(twitter_username=sender_name, is_registered=True, avatar_updated_at=now)
+    recipient = User(twitter_username=recipient_name, is_registered=True, avatar_updated_at=now)
+    db_session.add_all([sender, recipient])
+    db_session.flush()
+
+    for i in range(count):
+        tweet = Tweet(id=first_tweet_id + i, tweet_author=recipient.id)
+        db_session.add(tweet)
+        db_session.flush()
+        db_session.add(
+            Tip(
+                tip_sender=sender.id,
+                tweet_id=tweet.id,
+                ln_payment_hash=f"{sender_name}-{i}",
+                amount_sats=100 + i,
+                paid_in=True,
+                created_at=now,
+            )
+        )
+    db_session.commit()
+    db_session.expunge_all()
+
+
+@pytest.mark.parametrize("direction, username", [("sent", "sender"), ("received", "recipient")])
+def test_tip_history_query_count_does_not_grow_with_rows(client, db_session, count_queries, direction, username):
+    """Per-row lazy loads of sender/tweet/author would make the query count scale with the page size."""
+    add_paid_tips(db_session, f"{direction}_few_sender", f"{direction}_few_recipient", 2)
+    add_paid_tips(db_session, f"{direction}_many_sender", f"{direction}_many_recipient", 20)
+
+    count_queries.clear()
+    response = client.get(f"/tips/{direction}/{direction}_few_{username}")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 2
+    few_queries = len(count_queries)
+
+    count_queries.clear()
+    response = client.get(f"/tips/{direction}/{direction}_many_{username}")
+    assert response.status_code == 200
+    assert len(response.json()["items"]) == 20
+    many_queries = len(count_queries)
+
+    assert many_queries == few_queries